@@ -0,0 +1,91 @@
+import ctypes
+
+from x11_support import c_atom, c_window, load_x11, open_display
+
+# Identity and geometry of the focused window, read from the EWMH
+# properties of an X11 (or XWayland) session through plain libX11 calls.
+# Everywhere else active_window() returns None.
+
+
+class WindowInfo:
+    def __init__(self, window_id, wm_class, x, y, width, height):
+        self.window_id = window_id
+        self.wm_class = wm_class  # stays the same across restarts, unlike the id
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return f"WindowInfo({self.wm_class!r}, {self.x}, {self.y}, {self.width}x{self.height})"
+
+
+class X11Windows:
+    def __init__(self):
+        self.x11 = x11 = load_x11()
+        self.display = open_display()
+        self.root = x11.XDefaultRootWindow(self.display)
+        self.net_active_window = x11.XInternAtom(self.display, b'_NET_ACTIVE_WINDOW', False)
+        self.wm_class = x11.XInternAtom(self.display, b'WM_CLASS', False)
+
+    def property(self, window, atom, length=1024):
+        # Raw bytes and item format (8, 16 or 32) of a window property, or None
+        actual_type = c_atom()
+        actual_format = ctypes.c_int()
+        items = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        status = self.x11.XGetWindowProperty(
+            self.display, window, atom, 0, length, False, 0,  # AnyPropertyType
+            ctypes.byref(actual_type), ctypes.byref(actual_format), ctypes.byref(items),
+            ctypes.byref(remaining), ctypes.byref(data))
+        if status != 0 or not data.value:
+            return None
+        try:
+            # Xlib hands 32 bit items back as C longs
+            size = {8: 1, 16: ctypes.sizeof(ctypes.c_short), 32: ctypes.sizeof(ctypes.c_long)}[actual_format.value]
+            return ctypes.string_at(data.value, items.value * size), actual_format.value
+        finally:
+            self.x11.XFree(data)
+
+    def active_window(self):
+        active = self.property(self.root, self.net_active_window)
+        if active is None or active[1] != 32 or len(active[0]) < ctypes.sizeof(c_window):
+            return None
+        window = c_window.from_buffer_copy(active[0]).value
+        if not window:
+            return None
+
+        wm_class = self.property(window, self.wm_class)
+        # "instance\0class\0", the class names the application
+        names = wm_class[0].split(b'\0') if wm_class else []
+        name = names[1] if len(names) > 1 and names[1] else (names[0] if names else b'')
+
+        root = c_window()
+        x, y = ctypes.c_int(), ctypes.c_int()
+        width, height, border, depth = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+        if not self.x11.XGetGeometry(self.display, window, ctypes.byref(root), ctypes.byref(x), ctypes.byref(y),
+                                     ctypes.byref(width), ctypes.byref(height), ctypes.byref(border),
+                                     ctypes.byref(depth)):
+            return None
+        child = c_window()
+        if not self.x11.XTranslateCoordinates(self.display, window, self.root, 0, 0,
+                                              ctypes.byref(x), ctypes.byref(y), ctypes.byref(child)):
+            return None
+        return WindowInfo(window, name.decode('utf-8', 'replace'), x.value, y.value, width.value, height.value)
+
+
+windows = None
+
+
+def active_window():
+    # The focused top-level window, None when that can't be found out
+    global windows
+    if windows is None:
+        try:
+            windows = X11Windows()
+        except OSError:
+            windows = False
+    if not windows:
+        return None
+    return windows.active_window()
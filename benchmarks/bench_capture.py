@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Capture latency of every screen capture backend, full screen and region
+# grabs, at several resolutions. Each resolution gets its own Xvfb server
+# and a child process that runs the backends against it.
+
+
+def start_xvfb(width, height):
+    # Returns the server process and its display name
+    read_end, write_end = os.pipe()
+    server = subprocess.Popen(
+        ['Xvfb', '-displayfd', str(write_end), '-screen', '0', f'{width}x{height}x24', '-nolisten', 'tcp'],
+        pass_fds=(write_end,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        number = f.readline().strip()
+    if not number:
+        server.kill()
+        raise RuntimeError(f"Xvfb didn't start for {width}x{height}")
+    return server, f':{number}'
+
+
+def fill_screen(width, height):
+    # Something other than a black screen to read back: a window with noise
+    from PyQt5.QtGui import QImage, QPixmap
+    from PyQt5.QtWidgets import QLabel
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+    image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGB32).copy()
+    label = QLabel()
+    label.setPixmap(QPixmap.fromImage(image))
+    label.setGeometry(0, 0, width, height)
+    label.show()
+    return label
+
+
+def time_grabs(grab, repeat, warmup):
+    for _ in range(warmup):
+        grab()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        grab()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return {
+        'mean_ms': round(float(latencies.mean()), 3),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'min_ms': round(float(latencies.min()), 3),
+    }
+
+
+def run_child(args):
+    # Runs on the Xvfb display named in DISPLAY
+    from PyQt5.QtCore import QRect
+    from PyQt5.QtWidgets import QApplication
+    from screen_capture import CAPTURE_BACKENDS
+
+    app = QApplication(sys.argv)
+    screen = app.primaryScreen()
+    width, height = screen.geometry().width(), screen.geometry().height()
+    window = fill_screen(width, height)
+    for _ in range(10):
+        app.processEvents()
+    region_width, region_height = (int(v) for v in args.region.split('x'))
+    region = QRect((width - region_width) // 2, (height - region_height) // 2, region_width, region_height)
+
+    results = []
+    for name in args.backends:
+        try:
+            backend = CAPTURE_BACKENDS[name]()
+        except (OSError, ImportError) as e:
+            print(f"Skipping {name} at {width}x{height}: {e}", file=sys.stderr)
+            continue
+        frame = backend.grab(screen)
+        results.append({
+            'backend': name,
+            'resolution': f'{width}x{height}',
+            'captured': f'{frame.width()}x{frame.height()}',
+            'full': time_grabs(lambda: backend.grab(screen), args.repeat, args.warmup),
+            'region': time_grabs(lambda: backend.grab(screen, region), args.repeat, args.warmup),
+        })
+        backend.close()
+    window.close()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen capture latency per backend and resolution, under Xvfb")
+    parser.add_argument('--resolutions', nargs='+', default=['1280x720', '1920x1080', '2560x1440', '3840x2160'])
+    parser.add_argument('--backends', nargs='+', default=['qt', 'xshm'])
+    parser.add_argument('--region', default='256x256', help="size of the region grabs")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--json', help="write the results to this file instead of stdout")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+    if shutil.which('Xvfb') is None:
+        sys.exit("Xvfb not found, install it (e.g. the xvfb package) to run this benchmark")
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.split('x'))
+        server, display = start_xvfb(width, height)
+        try:
+            env = dict(os.environ, DISPLAY=display, QT_QPA_PLATFORM='xcb')
+            env.pop('WAYLAND_DISPLAY', None)
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', '--backends', *args.backends,
+                 '--region', args.region, '--repeat', str(args.repeat), '--warmup', str(args.warmup)],
+                env=env, stdout=subprocess.PIPE, text=True, check=True)
+            results.extend(json.loads(child.stdout.strip().splitlines()[-1]))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for result in results:
+        print(f"{result['backend']:>5} {result['resolution']:>10}  full p50 {result['full']['p50_ms']:8.2f} ms"
+              f"  region p50 {result['region']['p50_ms']:6.2f} ms", file=sys.stderr)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'region': args.region,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
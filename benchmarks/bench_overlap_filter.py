@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtCore import QRect
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from box_utils import filter_overlapping_boxes
+
+
+# The QRect based filter OverlayWindow used before the NumPy version, kept as the reference
+def legacy_filter(elements, overlap_threshold=0.2):
+    sorted_elements = sorted(elements, key=lambda e: e.width() * e.height())
+    filtered_elements = []
+    for element in sorted_elements:
+        if all(not legacy_is_significant_overlap(element, filtered_elem, overlap_threshold)
+               for filtered_elem in filtered_elements):
+            filtered_elements.append(element)
+    return filtered_elements
+
+
+def legacy_is_significant_overlap(elem1, elem2, threshold):
+    intersect = elem1.intersected(elem2)
+    intersect_area = intersect.width() * intersect.height()
+    elem1_area = elem1.width() * elem1.height()
+    elem2_area = elem2.width() * elem2.height()
+    if elem1_area == 0 or elem2_area == 0:
+        return False
+    return intersect_area / min(elem1_area, elem2_area) > threshold
+
+
+def random_boxes(count, width, height, rng):
+    # UI-like detections: mostly small widgets, some containers, clustered into rows
+    sizes = rng.choice([0, 1, 2], size=count, p=[0.7, 0.25, 0.05])
+    w = np.where(sizes == 0, rng.integers(8, 120, count),
+                 np.where(sizes == 1, rng.integers(100, 600, count), rng.integers(500, width, count)))
+    h = np.where(sizes == 0, rng.integers(8, 40, count),
+                 np.where(sizes == 1, rng.integers(30, 300, count), rng.integers(200, height, count)))
+    x = rng.integers(0, width, count) - w // 2
+    rows = rng.integers(0, height // 24, count) * 24
+    y = rows + rng.integers(-4, 4, count)
+    return np.stack([x, y, w, h], axis=1).astype(np.int64)
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy overlap filter against the QRect implementation")
+    parser.add_argument('--counts', type=int, nargs='+', default=[128, 512, 2048, 4096])
+    parser.add_argument('--size', default='3840x2160')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-legacy-above', type=int, default=4096)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'boxes':>6} {'kept':>6} {'legacy ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for count in args.counts:
+        boxes = random_boxes(count, width, height, rng)
+        numpy_time, keep = best_of(args.repeat, filter_overlapping_boxes, boxes)
+
+        if count > args.skip_legacy_above:
+            print(f"{count:>6} {len(keep):>6} {'-':>10} {numpy_time * 1000:>10.2f} {'-':>8}")
+            continue
+
+        rects = [QRect(*map(int, box)) for box in boxes]
+        legacy_time, legacy_kept = best_of(1, legacy_filter, rects)
+        legacy_boxes = [(r.x(), r.y(), r.width(), r.height()) for r in legacy_kept]
+        if legacy_boxes != [tuple(map(int, boxes[i])) for i in keep]:
+            sys.exit(f"Mismatch against the legacy filter for {count} boxes")
+
+        print(f"{count:>6} {len(keep):>6} {legacy_time * 1000:>10.2f} {numpy_time * 1000:>10.2f} "
+              f"{legacy_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
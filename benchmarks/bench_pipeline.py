@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Headless: no X server for Qt or for pynput, which overlay_window imports
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('PYNPUT_BACKEND', 'dummy')
+# Start from an empty click history and window memory, not the user's
+state_dir = tempfile.TemporaryDirectory(prefix='univim_bench_')
+os.environ['UNIVIM_CLICK_HISTORY_PATH'] = os.path.join(state_dir.name, 'click_history.json')
+os.environ['UNIVIM_WINDOW_MEMORY_PATH'] = os.path.join(state_dir.name, 'window_memory.npz')
+
+import numpy as np
+from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from screen_capture import CapturedFrame
+from inference_backends import UltralyticsBackend
+from overlay_render import RenderCache
+from overlay_window import OverlayWindow
+
+
+def load_screenshots(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ('*.png', '*.jpg', '*.jpeg'):
+                files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    frames = []
+    for f in files:
+        image = QImage(f)
+        if image.isNull():
+            print(f"Skipping unreadable screenshot {f}", file=sys.stderr)
+            continue
+        frames.append((f, CapturedFrame(image)))
+    return frames
+
+
+class Stage:
+    # Latencies and items processed for one pipeline stage over the whole corpus
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.peak_memory = 0
+
+    def time(self, fn, items=1):
+        start = time.perf_counter()
+        result = fn()
+        self.latencies.append(time.perf_counter() - start)
+        self.items += items
+        return result
+
+    def trace_memory(self, fn):
+        # Separate untimed call, tracemalloc slows the allocations it watches.
+        # Only Python side allocations are seen, Qt's own buffers are not
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            fn()
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    def report(self):
+        total = sum(self.latencies)
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'calls': len(self.latencies),
+            'items': self.items,
+            'calls_per_s': len(self.latencies) / total if total else float('nan'),
+            'items_per_s': self.items / total if total else float('nan'),
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'peak_memory_kb': self.peak_memory / 1024,
+        }
+
+
+def paint(overlay, target):
+    # QWidget.render goes through paintEvent, same as a repaint on screen
+    overlay.render(target)
+
+
+def bench_screenshot(overlay, model, frame, stages, repeat):
+    results = list(model.results(frame.pixels))  # the model itself is not measured here
+    target = QImage(overlay.size(), QImage.Format_ARGB32_Premultiplied)
+
+    def extract():
+        return np.concatenate([overlay.extract_elements_from_result(r) for r in results])
+
+    boxes = extract()
+    for _ in range(repeat):
+        stages['extract'].time(extract, len(boxes))
+    stages['extract'].trace_memory(extract)
+
+    filter_boxes = lambda: overlay.filter_overlapping_elements(boxes)
+    elements = filter_boxes()
+    for _ in range(repeat):
+        stages['filter'].time(filter_boxes, len(boxes))
+    stages['filter'].trace_memory(filter_boxes)
+
+    labels = lambda: overlay.generate_labels(len(elements))
+    for _ in range(repeat):
+        stages['generate_labels'].time(labels, len(elements))
+    stages['generate_labels'].trace_memory(labels)
+
+    # The labelling hints really go through: click weights, tracker and
+    # prefix code allocation, from scratch as on a new activation
+    overlay.current_frame = frame
+
+    def assign_labels():
+        overlay.tracker.reset()
+        return overlay.label_elements(elements, (frame.width(), frame.height()))
+    for _ in range(repeat):
+        stages['assign_labels'].time(assign_labels, len(elements))
+    stages['assign_labels'].trace_memory(assign_labels)
+
+    # Hint mode: first paint after a new set of hints, repaints, then one typed letter
+    overlay.is_grid_view_active = False
+    overlay.is_overlay_active = True
+
+    def new_hints():
+        overlay.current_input = ''
+        overlay.render_cache = RenderCache(overlay.label_font)
+        overlay.show_elements(elements)
+
+    def type_first_letter():
+        if len(overlay.element_labels):
+            overlay.apply_label_prefix(overlay.element_labels[0][0])
+
+    for _ in range(repeat):
+        new_hints()
+        stages['paint_hints_cold'].time(lambda: paint(overlay, target), len(elements))
+        stages['paint_hints_warm'].time(lambda: paint(overlay, target), len(elements))
+        type_first_letter()
+        stages['paint_hints_typed'].time(lambda: paint(overlay, target), len(overlay.element_labels.matches()))
+    new_hints()
+    stages['paint_hints_cold'].trace_memory(lambda: paint(overlay, target))
+    stages['paint_hints_warm'].trace_memory(lambda: paint(overlay, target))
+    type_first_letter()
+    stages['paint_hints_typed'].trace_memory(lambda: paint(overlay, target))
+    overlay.current_input = ''
+    overlay.is_overlay_active = False
+
+    # Grid mode: 26x26 cells, the same for every screenshot of a given size
+    overlay.is_grid_view_active = True
+    overlay.grid_mode = 'main'
+
+    def new_grid():
+        overlay.current_input = ''
+        overlay.render_cache = RenderCache(overlay.label_font)
+
+    for _ in range(repeat):
+        new_grid()
+        stages['paint_grid_cold'].time(lambda: paint(overlay, target))
+        stages['paint_grid_warm'].time(lambda: paint(overlay, target))
+        overlay.current_input = 'a'
+        stages['paint_grid_typed'].time(lambda: paint(overlay, target))
+    new_grid()
+    stages['paint_grid_cold'].trace_memory(lambda: paint(overlay, target))
+    stages['paint_grid_warm'].trace_memory(lambda: paint(overlay, target))
+    overlay.current_input = 'a'
+    stages['paint_grid_typed'].trace_memory(lambda: paint(overlay, target))
+    overlay.current_input = ''
+    overlay.is_grid_view_active = False
+    return len(boxes), len(elements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the detection post-processing and overlay painting")
+    parser.add_argument('screenshots', nargs='+', help="screenshots or directories of screenshots")
+    parser.add_argument('--weights', default='weights/cloud.pt')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    frames = load_screenshots(args.screenshots)
+    if not frames:
+        sys.exit("No screenshots found")
+
+    model = UltralyticsBackend(args.weights)
+    overlay = OverlayWindow(preload_model=False)
+    names = ['extract', 'filter', 'generate_labels', 'assign_labels',
+             'paint_hints_cold', 'paint_hints_warm', 'paint_hints_typed',
+             'paint_grid_cold', 'paint_grid_warm', 'paint_grid_typed']
+    stages = {name: Stage(name) for name in names}
+
+    screenshots = []
+    # The overlay logs to stdout, keep that for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        for path, frame in frames:
+            overlay.setGeometry(0, 0, frame.width(), frame.height())
+            detected, kept = bench_screenshot(overlay, model, frame, stages, args.repeat)
+            screenshots.append({'path': path, 'width': frame.width(), 'height': frame.height(),
+                                'boxes': detected, 'elements': kept})
+            print(f"{os.path.basename(path)}: {detected} boxes, {kept} after filtering", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'platform': app.platformName(),
+        'repeat': args.repeat,
+        'screenshots': screenshots,
+        'stages': {name: stage.report() for name, stage in stages.items() if stage.latencies},
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    output = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from box_utils import filter_overlapping_boxes
+from inference_backends import BACKENDS, load_backend
+
+
+def load_images(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ('*.png', '*.jpg', '*.jpeg'):
+                files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return [(f, cv2.imread(f)) for f in files]
+
+
+def iou_matrix(a, b):
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    width = np.minimum(ax2[:, None], bx2[None]) - np.maximum(a[:, 0, None], b[None, :, 0])
+    height = np.minimum(ay2[:, None], by2[None]) - np.maximum(a[:, 1, None], b[None, :, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None] - intersection
+    return intersection / np.maximum(union, 1)
+
+
+def match_rate(reference, candidate, threshold=0.5):
+    # Share of reference boxes that have a candidate box with IoU >= threshold
+    if len(reference) == 0:
+        return 1.0
+    if len(candidate) == 0:
+        return 0.0
+    return float((iou_matrix(reference, candidate).max(axis=1) >= threshold).mean())
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency and agreement of the inference backends")
+    parser.add_argument('images', nargs='+', help="screenshots or directories of screenshots")
+    parser.add_argument('--weights', default='weights/cloud.pt')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8', 'openvino', 'openvino-int8'])
+    parser.add_argument('--calibration-data')
+    parser.add_argument('--tile-size', type=int, default=0, help="also run every backend with tiled inference")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        sys.exit("No images found")
+
+    reference = None
+    report = []
+    runs = [(spec, None) for spec in args.backends]
+    if args.tile_size:
+        runs += [(f"{spec}-tiled", args.tile_size) for spec in args.backends]
+    for spec, tile_size in runs:
+        name, _, variant = spec.partition('-')
+        if name not in BACKENDS:
+            print(f"Skipping unknown backend {spec}")
+            continue
+        backend = load_backend(name, args.weights, int8=variant.startswith('int8'),
+                               calibration_data=args.calibration_data, tile_size=tile_size)
+        if getattr(backend, 'backend', backend).name != name:
+            print(f"Skipping {spec}, it fell back to {backend.name}")
+            continue
+
+        backend.detect(images[0][1])  # warm up
+        latencies = []
+        detections = []
+        for _, pixels in images:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                boxes = backend.detect(pixels)
+                latencies.append(time.perf_counter() - start)
+            detections.append(boxes[filter_overlapping_boxes(boxes)])
+
+        if reference is None:
+            reference = detections
+        agreement = [match_rate(ref, det) for ref, det in zip(reference, detections)]
+        row = {
+            'backend': spec,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'boxes_per_image': float(np.mean([len(d) for d in detections])),
+            'match_rate_vs_first': float(np.mean(agreement)),
+        }
+        report.append(row)
+        print(f"{spec:>14}  p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms  "
+              f"boxes {row['boxes_per_image']:7.1f}  match {row['match_rate_vs_first'] * 100:5.1f}%")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+
+from box_utils import box_areas, empty_boxes, intersecting_pairs
+
+
+class TakenLabels:
+    # The hint labels in use. One instance is shared by the trackers of all
+    # screens, so new labels never clash with (or prefix) a label shown on
+    # any of them.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.labels = set()
+
+    def add(self, labels):
+        with self.lock:
+            self.labels.update(labels)
+
+    def release(self, labels):
+        with self.lock:
+            self.labels.difference_update(labels)
+
+    def snapshot(self):
+        with self.lock:
+            return set(self.labels)
+
+
+class BoxTracker:
+    # Associates the boxes of successive detection passes, so an element
+    # keeps its hint label for as long as it stays on screen. Boxes are matched greedily by IoU, what's
+    # left by centre distance between boxes of similar size.
+
+    def __init__(self, taken=None, iou_threshold=0.3, max_distance=24, max_missed=0):
+        self.taken = taken or TakenLabels()
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed  # final passes a track may go unmatched before its label is freed
+        self.boxes = empty_boxes()
+        self.track_labels = []
+        self.missed = np.empty(0, dtype=np.int64)
+
+    def match(self, tracks, boxes):
+        # Pairs (track, box), every track and box used at most once
+        count = len(tracks)
+        first, second, intersection = intersecting_pairs(np.concatenate((tracks, boxes)))
+        cross = (first < count) != (second < count)
+        track = np.where(first < count, first, second)[cross]
+        box = np.where(first < count, second, first)[cross] - count
+        intersection = intersection[cross]
+        union = box_areas(tracks)[track] + box_areas(boxes)[box] - intersection
+        iou = intersection / np.maximum(union, 1)
+
+        matched_tracks = np.full(len(tracks), -1, dtype=np.int64)
+        matched_boxes = np.full(len(boxes), -1, dtype=np.int64)
+        for i in np.argsort(-iou, kind='stable'):
+            if iou[i] < self.iou_threshold:
+                break
+            if matched_tracks[track[i]] < 0 and matched_boxes[box[i]] < 0:
+                matched_tracks[track[i]] = box[i]
+                matched_boxes[box[i]] = track[i]
+
+        # Boxes that moved a little too far for their IoU to count
+        left_tracks = np.nonzero(matched_tracks < 0)[0]
+        left_boxes = np.nonzero(matched_boxes < 0)[0]
+        if len(left_tracks) and len(left_boxes):
+            track_centers = tracks[left_tracks, :2] + tracks[left_tracks, 2:4] / 2
+            box_centers = boxes[left_boxes, :2] + boxes[left_boxes, 2:4] / 2
+            distance = np.hypot(*(track_centers[:, None] - box_centers[None]).transpose(2, 0, 1))
+            ratio = box_areas(tracks[left_tracks])[:, None] / np.maximum(box_areas(boxes[left_boxes]), 1)[None]
+            distance[(ratio < 0.5) | (ratio > 2) | (distance > self.max_distance)] = np.inf
+            for flat in np.argsort(distance, axis=None):
+                t, b = divmod(int(flat), len(left_boxes))
+                if not np.isfinite(distance[t, b]):
+                    break
+                if matched_tracks[left_tracks[t]] < 0 and matched_boxes[left_boxes[b]] < 0:
+                    matched_tracks[left_tracks[t]] = left_boxes[b]
+                    matched_boxes[left_boxes[b]] = left_tracks[t]
+        return matched_tracks, matched_boxes
+
+    def update(self, boxes, allocate, final=True, motion=None):
+        # Returns the label of every box. Boxes without a track get theirs
+        # from `allocate(indices, taken)`, which picks labels for those boxes
+        # that don't clash with the `taken` ones, or returns None when there
+        # is no room left (then every box here is labelled afresh, and if
+        # that doesn't fit either the tracker starts over and returns None).
+        # `motion` (a ScrollEstimate from the frame of the last update to this
+        # one) moves the tracks along first. Unmatched tracks only age on
+        # `final` passes, partial results of a pass that is still running
+        # don't count against them.
+        tracks = self.boxes.copy()
+        if motion is not None and len(tracks):
+            tracks[motion.inside(tracks), 1] -= motion.offset
+        matched_tracks, matched_boxes = self.match(tracks, boxes)
+
+        missed = self.missed + 1
+        missed[matched_tracks >= 0] = 0
+        keep = matched_tracks < 0
+        if final:
+            # Free the labels of vanished elements first, new ones may reuse them
+            expired = keep & (missed > self.max_missed)
+            self.taken.release([self.track_labels[i] for i in np.nonzero(expired)[0]])
+            keep &= ~expired
+        else:
+            missed[keep] = self.missed[keep]
+
+        labels = [self.track_labels[track] if track >= 0 else None for track in matched_boxes.tolist()]
+        new = [i for i, label in enumerate(labels) if label is None]
+        if new:
+            allocated = allocate(new, self.taken.snapshot())
+            if allocated is None:
+                self.taken.release(self.track_labels)
+                keep[:] = False
+                new = list(range(len(boxes)))
+                allocated = allocate(new, self.taken.snapshot())
+                if allocated is None:
+                    # Other screens' labels fill the whole code space, the
+                    # caller has to plan every screen's labels again
+                    self.reset()
+                    return None
+            for i, label in zip(new, allocated):
+                labels[i] = label
+            self.taken.add(allocated)
+
+        self.boxes = np.concatenate((tracks[keep], boxes))
+        self.track_labels = [self.track_labels[i] for i in np.nonzero(keep)[0]] + labels
+        self.missed = np.concatenate((missed[keep], np.zeros(len(boxes), dtype=np.int64)))
+        return labels
+
+    def assign(self, boxes, labels):
+        # Starts over from `boxes`, shown with the given labels
+        self.reset()
+        self.boxes = boxes.copy()
+        self.track_labels = list(labels)
+        self.missed = np.zeros(len(boxes), dtype=np.int64)
+        self.taken.add(labels)
+
+    def reset(self):
+        self.taken.release(self.track_labels)
+        self.boxes = empty_boxes()
+        self.track_labels = []
+        self.missed = np.empty(0, dtype=np.int64)
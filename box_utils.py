@@ -0,0 +1,157 @@
+import numpy as np
+from PyQt5.QtCore import QRect
+
+import tracing
+
+# Boxes are kept as an (N, 5) integer array of x, y, width, height rows,
+# the same geometry QRect(x, y, width, height) describes, plus the model's
+# confidence in thousandths. Geometry helpers only look at the first four.
+SCORE = 4
+SCORE_SCALE = 1000
+
+
+def box_areas(boxes):
+    return boxes[:, 2] * boxes[:, 3]
+
+
+def intersecting_pairs(boxes):
+    # Every pair of boxes with a non-empty intersection, and that intersection's area.
+    # Sweep along x: after sorting by left edge, the only boxes that can
+    # intersect box p are the ones whose left edge lies before p's right edge
+    by_left = np.argsort(boxes[:, 0], kind='stable')
+    left = boxes[by_left, 0]
+    top = boxes[by_left, 1]
+    right = left + boxes[by_left, 2]
+    bottom = top + boxes[by_left, 3]
+    ends = np.searchsorted(left, right, side='left')
+
+    positions = np.arange(len(boxes))
+    counts = np.clip(ends - positions - 1, 0, None)
+    first = np.repeat(positions, counts)
+    # second runs from first + 1 up to ends[first] - 1 within each group
+    group_starts = np.cumsum(counts) - counts
+    second = np.arange(int(counts.sum())) + np.repeat(positions + 1 - group_starts, counts)
+
+    # Candidates already overlap along x, drop the ones that miss along y
+    height = np.minimum(bottom[first], bottom[second]) - np.maximum(top[first], top[second])
+    candidates = height > 0
+    first, second, height = first[candidates], second[candidates], height[candidates]
+
+    width = np.minimum(right[first], right[second]) - left[second]
+    return by_left[first], by_left[second], width * height
+
+
+def overlapping_pairs(boxes, overlap_threshold):
+    first, second, intersection = intersecting_pairs(boxes)
+    areas = box_areas(boxes)
+    smaller = np.minimum(areas[first], areas[second])
+
+    # Zero-area boxes never count as overlapping anything
+    significant = smaller > 0
+    significant[significant] = intersection[significant] / smaller[significant] > overlap_threshold
+    return first[significant], second[significant]
+
+
+def deduplicate_boxes(boxes, iou_threshold=0.6):
+    # Indices of the boxes left after dropping the later box of every pair
+    # whose intersection over union exceeds the threshold
+    boxes = np.asarray(boxes, dtype=np.int64)[..., :4].reshape(-1, 4)
+    first, second, intersection = intersecting_pairs(boxes)
+    areas = box_areas(boxes)
+    union = areas[first] + areas[second] - intersection
+    duplicate = intersection > iou_threshold * np.maximum(union, 1)
+    keep = np.ones(len(boxes), dtype=bool)
+    keep[np.maximum(first, second)[duplicate]] = False
+    return np.nonzero(keep)[0]
+
+
+def filter_overlapping_boxes(boxes, overlap_threshold=0.2, keep_first=0):
+    # Greedy smallest-first suppression: a box is kept unless it overlaps an
+    # already kept box by more than `overlap_threshold` of the smaller area.
+    # The first `keep_first` boxes are always kept and take precedence.
+    # Returns the indices of the kept boxes, in the order they were kept.
+    boxes = np.asarray(boxes, dtype=np.int64)[..., :4].reshape(-1, 4)
+    order = np.argsort(box_areas(boxes[keep_first:]), kind='stable') + keep_first
+    order = np.concatenate((np.arange(min(keep_first, len(boxes))), order))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    # Point every conflicting pair from the smaller box (processed first) to the larger one
+    first, second = overlapping_pairs(boxes, overlap_threshold)
+    first, second = rank[first], rank[second]
+    source = np.minimum(first, second)
+    target = np.maximum(first, second)
+    by_source = np.argsort(source, kind='stable')
+    target = target[by_source]
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(source, minlength=len(order))))).tolist()
+
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i] and i >= keep_first:
+            continue
+        keep.append(i)
+        start, stop = bounds[i], bounds[i + 1]
+        if stop > start:
+            suppressed[target[start:stop]] = True
+
+    return order[np.array(keep, dtype=np.int64)]
+
+
+def empty_boxes():
+    return np.empty((0, 5), dtype=np.int64)
+
+
+def with_scores(boxes, score=SCORE_SCALE):
+    # Boxes from a source that has no confidences (x, y, width, height rows)
+    # count as certain
+    boxes = np.asarray(boxes, dtype=np.int64)
+    if boxes.ndim == 2 and boxes.shape[1] == 5:
+        return boxes
+    boxes = boxes[..., :4].reshape(-1, 4)
+    return np.concatenate((boxes, np.full((len(boxes), 1), score, dtype=np.int64)), axis=1)
+
+
+class IncrementalFilter:
+    # Overlap filtering for boxes that arrive in batches: boxes accepted
+    # earlier are never dropped or reordered, new ones are only kept if they
+    # don't overlap them
+
+    def __init__(self, overlap_threshold=0.2):
+        self.overlap_threshold = overlap_threshold
+        self.boxes = empty_boxes()
+
+    def add(self, boxes):
+        accepted = len(self.boxes)
+        combined = np.concatenate((self.boxes, boxes))
+        with tracing.span('overlap_filter', count=len(combined)):
+            keep = filter_overlapping_boxes(combined, self.overlap_threshold, keep_first=accepted)
+        self.boxes = combined[np.concatenate((np.arange(accepted), keep[keep >= accepted]))]
+        return self.boxes
+
+
+def boxes_from_result(result):
+    # Decode every detection of a YOLO result to pixel x, y, width, height in one step
+    if result.boxes is None or len(result.boxes) == 0:
+        return empty_boxes()
+    xywhn = result.boxes.xywhn.cpu().numpy().astype(np.float64)
+    orig_height, orig_width = result.orig_shape[:2]
+    width = (xywhn[:, 2] * orig_width).astype(np.int64)
+    height = (xywhn[:, 3] * orig_height).astype(np.int64)
+    x = (xywhn[:, 0] * orig_width - width / 2).astype(np.int64)
+    y = (xywhn[:, 1] * orig_height - height / 2).astype(np.int64)
+    score = (result.boxes.conf.cpu().numpy().astype(np.float64) * SCORE_SCALE).round().astype(np.int64)
+    return np.stack([x, y, width, height, score], axis=1)
+
+
+def box_to_qrect(box, scale=1.0):
+    if scale != 1.0:
+        return QRect(*(int(v * scale) for v in box[:4]))
+    x, y, width, height = (int(v) for v in box[:4])
+    return QRect(x, y, width, height)
+
+
+def box_center(box):
+    # Same point QRect.center() returns
+    x, y, width, height = (int(v) for v in box[:4])
+    return (2 * x + width - 1) // 2, (2 * y + height - 1) // 2
@@ -0,0 +1,104 @@
+import os
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Also write every captured frame to disk (the model itself reads from memory)
+DEBUG_SCREENSHOT = env_flag('UNIVIM_DEBUG_SCREENSHOT')
+DEBUG_SCREENSHOT_PATH = os.environ.get('UNIVIM_DEBUG_SCREENSHOT_PATH', 'current_screen.png')
+
+# Number of past frames whose detections are kept for instant re-activation (0 disables)
+DETECTION_CACHE_SIZE = int(os.environ.get('UNIVIM_DETECTION_CACHE_SIZE', '16'))
+
+# Tile size in pixels used to find the parts of the screen that changed since the last detection
+DETECTION_TILE_SIZE = int(os.environ.get('UNIVIM_DETECTION_TILE_SIZE', '256'))
+
+# Speculative detection before activation: 'off', 'shift' (start on the first
+# Shift press) or 'idle' (also refresh every PREFETCH_IDLE_INTERVAL seconds)
+PREFETCH_MODE = os.environ.get('UNIVIM_PREFETCH', 'off').strip().lower()
+PREFETCH_IDLE_INTERVAL = float(os.environ.get('UNIVIM_PREFETCH_IDLE_INTERVAL', '5'))
+# Fraction of wall-clock time prefetching may spend on inference
+PREFETCH_CPU_BUDGET = float(os.environ.get('UNIVIM_PREFETCH_CPU_BUDGET', '0.25'))
+PREFETCH_ON_BATTERY = env_flag('UNIVIM_PREFETCH_ON_BATTERY')
+
+# Detection model and the runtime it is executed with: 'torch', 'onnx' or 'openvino'.
+# Exported models are written next to the weights and reused until the weights change.
+MODEL_WEIGHTS = os.environ.get('UNIVIM_MODEL_WEIGHTS', 'weights/cloud.pt')
+INFERENCE_BACKEND = os.environ.get('UNIVIM_INFERENCE_BACKEND', 'torch').strip().lower()
+INFERENCE_INT8 = env_flag('UNIVIM_INFERENCE_INT8')
+# Dataset yaml used to calibrate OpenVINO int8 quantization
+INT8_CALIBRATION_DATA = os.environ.get('UNIVIM_INT8_CALIBRATION_DATA')
+
+# Run the model in a separate process so it never competes with the UI for the GIL
+INFERENCE_WORKER = env_flag('UNIVIM_INFERENCE_WORKER', default=True)
+
+# Tiled inference for large screens: frames bigger than 1.5 tiles are cut into
+# overlapping tiles of this many pixels (0 disables) and inferred as one batch
+INFERENCE_TILE_SIZE = int(os.environ.get('UNIVIM_INFERENCE_TILE_SIZE', '0'))
+INFERENCE_TILE_OVERLAP = float(os.environ.get('UNIVIM_INFERENCE_TILE_OVERLAP', '0.25'))
+
+# Show hints as each detection stage finishes, changed regions nearest the
+# mouse cursor first. A PROGRESSIVE_FOCUS_SIZE above 0 also runs the model on
+# a square of that many pixels around the cursor before the whole frame:
+# hints near the cursor show up sooner, at the cost of a second inference
+PROGRESSIVE_DETECTION = env_flag('UNIVIM_PROGRESSIVE_DETECTION', default=True)
+PROGRESSIVE_FOCUS_SIZE = int(os.environ.get('UNIVIM_PROGRESSIVE_FOCUS_SIZE', '0'))
+
+# Separately loaded models (or worker processes) when there are several
+# screens, extra screens share them. Each model detects in parallel with the
+# others, so only raise this with cores (or a GPU) to spare for that; with 1
+# a single inference runs at a time
+MAX_INFERENCE_MODELS = max(1, int(os.environ.get('UNIVIM_MAX_INFERENCE_MODELS', '1')))
+
+# Record timing spans for the hotkey-to-click path; written as a Chrome trace on exit
+TRACE = env_flag('UNIVIM_TRACE')
+TRACE_PATH = os.environ.get('UNIVIM_TRACE_PATH', 'univim_trace.json')
+
+# Input hook log: records at or above this level ('debug' includes every key)
+# are kept in a ring buffer, dumped with `kill -USR1 <pid>`, and echoed to
+# stderr only when UNIVIM_INPUT_LOG_ECHO is set
+INPUT_LOG_LEVEL = os.environ.get('UNIVIM_INPUT_LOG_LEVEL', 'info').lower()
+INPUT_LOG_SIZE = int(os.environ.get('UNIVIM_INPUT_LOG_SIZE', '4096'))
+INPUT_LOG_ECHO = env_flag('UNIVIM_INPUT_LOG_ECHO')
+
+# While hints are shown, follow scrolling: shift the known boxes with the
+# content and only detect the newly exposed rows, at most every N ms
+SCROLL_TRACKING = env_flag('UNIVIM_SCROLL_TRACKING', True)
+SCROLL_UPDATE_INTERVAL = int(os.environ.get('UNIVIM_SCROLL_UPDATE_INTERVAL', '100'))
+
+# Keep hints live while shown: every N ms (0 = off) the hints are moved with
+# scrolled content, and every LIVE_INFERENCE_EVERY-th time the model runs
+LIVE_REFRESH_INTERVAL = int(os.environ.get('UNIVIM_LIVE_REFRESH_INTERVAL', '0'))
+LIVE_INFERENCE_EVERY = max(1, int(os.environ.get('UNIVIM_LIVE_INFERENCE_EVERY', '5')))
+
+# Remember the detections of the focused window (X11/EWMH) across
+# activations and restarts, and reuse them where they still match
+WINDOW_MEMORY = env_flag('UNIVIM_WINDOW_MEMORY', True)
+WINDOW_MEMORY_PATH = os.environ.get('UNIVIM_WINDOW_MEMORY_PATH', os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'univim', 'window_memory.npz'))
+WINDOW_MEMORY_MAX_ENTRIES = int(os.environ.get('UNIVIM_WINDOW_MEMORY_MAX_ENTRIES', '64'))
+WINDOW_MEMORY_MAX_BYTES = int(float(os.environ.get('UNIVIM_WINDOW_MEMORY_MAX_MB', '8')) * (1 << 20))
+
+# Hint label letters, most convenient first. Labels form a prefix code over
+# them, with the shortest labels on the elements most likely to be clicked:
+# by model confidence and by past clicks, remembered per application
+LABEL_ALPHABET = ''.join(dict.fromkeys(
+    c for c in os.environ.get('UNIVIM_LABEL_ALPHABET', 'abcdefghijklmnopqrstuvwxyz').lower() if c.isalpha()))
+if len(LABEL_ALPHABET) < 2:
+    LABEL_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+CLICK_HISTORY = env_flag('UNIVIM_CLICK_HISTORY', True)
+CLICK_HISTORY_PATH = os.environ.get('UNIVIM_CLICK_HISTORY_PATH', os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'univim', 'click_history.json'))
+
+# Screen capture: 'xshm' (X11 shared memory), 'qt' (QScreen.grabWindow) or
+# 'auto' (xshm on X11, qt everywhere else)
+CAPTURE_BACKEND = os.environ.get('UNIVIM_CAPTURE_BACKEND', 'auto').strip().lower()
+
+# ms between clearing the selected grid cell and grabbing it for the zoom
+# view, time for a compositor to show the screen without the overlay there
+ZOOM_CAPTURE_DELAY = int(os.environ.get('UNIVIM_ZOOM_CAPTURE_DELAY', '50'))
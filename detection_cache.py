@@ -0,0 +1,67 @@
+from collections import OrderedDict
+import hashlib
+import threading
+
+import numpy as np
+
+
+def frame_signature(pixels, step=4):
+    # Hash of every `step`th pixel along both axes. Anything larger than
+    # `step` pixels that changes, like a new button or icon, changes the
+    # key, so a cache hit can be trusted without running the model.
+    height, width = pixels.shape[:2]
+    sample = np.ascontiguousarray(pixels[::step, ::step])
+    return (width, height, hashlib.blake2b(sample.data, digest_size=16).digest())
+
+
+class DetectionCache:
+    # Bounded LRU map from a frame signature to the detections found on it.
+    # Read on the UI thread, written by the detection threads.
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            elements = self.entries.get(key)
+            if elements is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return elements
+
+    def put(self, key, elements):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = elements
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+            }
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import threading
+
+
+class DetectionJob:
+    def __init__(self, owner, generation, key, kind, run, lane=None):
+        self.owner = owner
+        self.generation = generation  # the owner's activation this job's results belong to
+        self.key = key  # frame signature being detected
+        self.kind = kind  # 'detect', or 'prefetch' for speculative work nobody waits for yet
+        self.run = run
+        self.lane = lane  # the model this job runs on
+        self.cancel_event = threading.Event()
+        self.done = False
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class DetectionScheduler:
+    # Runs detection jobs on one thread per lane, a lane being a model: jobs
+    # on the same model run one at a time, so only one inference per model
+    # ever competes for the CPU. Screens only detect in parallel when they
+    # were given models of their own (config.MAX_INFERENCE_MODELS). Each owner (an overlay) has at most one pending
+    # job: a newer request replaces it and cancels the owner's running job,
+    # unless that one is already detecting the same frame, in which case it's
+    # adopted by the newer request instead of restarted.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = OrderedDict()  # owner -> job
+        self.running = {}  # lane -> job
+        self.threads = {}  # lane -> thread
+        self.closed = False
+
+    def submit(self, owner, generation, key, run, kind='detect', lane=None):
+        # `run(job)` is called on the lane's thread
+        job = DetectionJob(owner, generation, key, kind, run, lane)
+        with self.lock:
+            self.cancel_locked(owner)
+            self.pending[owner] = job
+            if lane not in self.threads:
+                thread = threading.Thread(target=self.run, args=(lane,), name='detection', daemon=True)
+                self.threads[lane] = thread
+                thread.start()
+            self.wakeup.notify_all()
+        return job
+
+    def adopt(self, owner, generation, key):
+        # Hands a queued or running job for the same frame over to a new
+        # activation, returns it or None when there is none to take over
+        with self.lock:
+            for job in (self.pending.get(owner), *self.running.values()):
+                if (job is not None and job.owner is owner and job.key == key
+                        and not job.done and not job.cancelled()):
+                    job.generation = generation
+                    job.kind = 'detect'
+                    return job
+        return None
+
+    def has_job(self, owner):
+        with self.lock:
+            return owner in self.pending or any(job.owner is owner for job in self.running.values())
+
+    def cancel(self, owner, kind=None):
+        with self.lock:
+            self.cancel_locked(owner, kind)
+
+    def cancel_locked(self, owner, kind=None):
+        job = self.pending.get(owner)
+        if job is not None and kind in (None, job.kind):
+            del self.pending[owner]
+            job.cancel_event.set()
+        for job in self.running.values():
+            if job.owner is owner and kind in (None, job.kind):
+                job.cancel_event.set()
+
+    def finish(self, job):
+        # Called by the job once its results are final. Afterwards it can't be
+        # adopted any more, so the returned answer (whether anyone wants the
+        # results) and job.generation stay valid
+        with self.lock:
+            job.done = True
+            return job.kind == 'detect' and not job.cancelled()
+
+    def next_job(self, lane):
+        # Oldest pending job on `lane`
+        for owner, job in self.pending.items():
+            if job.lane is lane:
+                del self.pending[owner]
+                return job
+        return None
+
+    def run(self, lane):
+        while True:
+            with self.lock:
+                job = None
+                while not self.closed:
+                    job = self.next_job(lane)
+                    if job is not None:
+                        break
+                    self.wakeup.wait()
+                if self.closed:
+                    return
+                self.running[lane] = job
+            try:
+                if not job.cancelled():
+                    job.run(job)
+            except Exception as e:
+                print(f"Detection failed: {e}")
+            finally:
+                with self.lock:
+                    job.done = True
+                    del self.running[lane]
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for job in self.pending.values():
+                job.cancel_event.set()
+            self.pending.clear()
+            for job in self.running.values():
+                job.cancel_event.set()
+            self.wakeup.notify_all()
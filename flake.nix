@@ -12,6 +12,7 @@
         buildInputs = with pkgs; [
           python310Packages.python
           python3Packages.pynput
+          xorg.xorgserver  # Xvfb, for benchmarks/bench_capture.py
         ];
         
         shellHook = ''
@@ -36,6 +37,7 @@
             pkgs.xorg.xrandr
             pkgs.xorg.libX11
             pkgs.xorg.libXrandr
+            pkgs.xorg.libXext
           ]}
 
           export QT_PLUGIN_PATH=venv/lib/python3.10/site-packages/PyQt5/Qt5/plugins
@@ -2,17 +2,23 @@ from pynput import keyboard
 from PyQt5.QtCore import QObject, pyqtSignal
 from threading import Event
 import time
+from input_log import log, DEBUG
 
 class GlobalHotKeys(QObject):
     key_pressed_signal = pyqtSignal(str)
     grid_view_signal = pyqtSignal()
     stop_grid_view_signal = pyqtSignal()
+    # Carry the time.perf_counter() of the key event so the receiver can measure dispatch latency
+    start_detection_signal = pyqtSignal(float)
+    stop_detection_signal = pyqtSignal(float)
+    exit_signal = pyqtSignal()
+    # First press of a possible double Shift, lets the overlay start detecting early
+    first_shift_signal = pyqtSignal()
+    # Keys that scroll the focused window while hints are shown
+    scroll_signal = pyqtSignal()
 
     def __init__(self):
         super().__init__()
-        self.start_event = Event()
-        self.stop_event = Event()
-        self.exit_event = Event()
         self.scroll_up_event = Event()
         self.scroll_down_event = Event()
         self.grid_view_event = Event()
@@ -30,23 +36,25 @@ class GlobalHotKeys(QObject):
             keyboard.Key.ctrl_l: self.on_ctrl,
             keyboard.Key.esc: self.on_activate_esc
         }
+        self.scroll_keys = {keyboard.Key.up, keyboard.Key.down, keyboard.Key.page_up, keyboard.Key.page_down}
 
     def on_activate_esc(self):
-        print("ESC key pressed")
+        log.info("esc")
         if self.is_grid_view_active:
             self.stop_grid_view_signal.emit()
             self.is_grid_view_active = False
         else:
-            self.stop_event.set()
+            self.stop_detection_signal.emit(time.perf_counter())
 
     def on_shift(self):
         current_time = time.time()
         # Check if the time since the last press is within the threshold
         if current_time - self.last_shift_press_time <= self.double_press_threshold:
-            print("Shift 2nd pressed")
-            self.start_event.set()
+            log.info("double_shift")
+            self.start_detection_signal.emit(time.perf_counter())
         else:
-            print("Shift key pressed")
+            log.debug("shift")
+            self.first_shift_signal.emit()
         
         # Update the last pressed time
         self.last_shift_press_time = current_time
@@ -55,29 +63,33 @@ class GlobalHotKeys(QObject):
         current_time = time.time()
         # Check if the time since the last press is within the threshold
         if current_time - self.last_ctrl_press_time <= self.double_press_threshold:
-            print("Ctrl 2nd pressed")
+            log.info("double_ctrl", grid_view=not self.is_grid_view_active)
             self.is_grid_view_active = not self.is_grid_view_active
             self.grid_view_signal.emit()
         else:
-            print("Ctrl key pressed")
+            log.debug("ctrl")
         
         # Update the last pressed time
         self.last_ctrl_press_time = current_time
 
     def on_press(self, key):
-        print(f"Key pressed: {key}")
+        # Hook callback: nothing here may block, logging only queues a record
+        log.debug("key_press", key=key)
         if key in self.hotkeys:
             self.hotkeys[key]()
+        elif key in self.scroll_keys:
+            if self.is_detection_active:
+                self.scroll_signal.emit()
         elif self.is_detection_active or self.is_grid_view_active:
             try:
                 char = key.char.lower()
-                print(f"Emitting key pressed signal: {char}")
+                log.debug("emit_key", char=char)
                 self.key_pressed_signal.emit(char)
             except AttributeError:
                 pass
 
     def on_release(self, key):
-        print(f"Key released: {key}")
+        log.debug("key_release", key=key)
 
     def start_listening(self):
         with keyboard.Listener(on_press=self.on_press, on_release=self.on_release) as l:
@@ -92,6 +104,8 @@ class GlobalHotKeys(QObject):
         self.is_detection_active = active
 
 if __name__ == "__main__":
+    log.level, log.echo = DEBUG, True
+    log.start()
     global_hotkeys = GlobalHotKeys()
     global_hotkeys.start_listening()
 
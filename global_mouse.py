@@ -1,21 +1,27 @@
 from pynput import mouse
-from threading import Event
+from PyQt5.QtCore import QObject, pyqtSignal
+import time
+from input_log import log, DEBUG
+
+class GlobalMouse(QObject):
+    # Carries the time.perf_counter() of the click so the receiver can measure dispatch latency
+    click_signal = pyqtSignal(float)
+    scroll_signal = pyqtSignal()
 
-class GlobalMouse:
     def __init__(self):
-        self.stop_event = Event()
+        super().__init__()
         self.listener = None
 
     def on_move(self, x, y):
         pass
 
     def on_scroll(self, x, y, dx, dy):
-        print("Mouse scrolled")
-        #self.stop_event.set()
+        log.debug("mouse_scroll", dx=dx, dy=dy)
+        self.scroll_signal.emit()
 
     def on_click(self, x, y, button, pressed):
-        print("Mouse clicked")
-        self.stop_event.set()
+        log.debug("mouse_click", button=button, pressed=pressed)
+        self.click_signal.emit(time.perf_counter())
 
     def start_listening(self):
         with mouse.Listener(on_move=self.on_move, on_click=self.on_click, on_scroll=self.on_scroll) as listener:
@@ -27,5 +33,7 @@ class GlobalMouse:
             self.listener.stop()
 
 if __name__ == "__main__":
+    log.level, log.echo = DEBUG, True
+    log.start()
     global_mouse = GlobalMouse()
     global_mouse.start_listening()
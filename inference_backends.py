@@ -0,0 +1,119 @@
+import os
+import threading
+import numpy as np
+
+from box_utils import boxes_from_result, empty_boxes
+import tracing
+
+
+def is_fresh(artifact, source):
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+
+class UltralyticsBackend:
+    # Runs a YOLO model through ultralytics, which picks the runtime from the
+    # weights it is given (.pt -> PyTorch, .onnx -> ONNX Runtime, an
+    # *_openvino_model directory -> OpenVINO)
+    name = 'torch'
+
+    def __init__(self, weights, conf=0.01, max_det=2048, iou=0.4):
+        from ultralytics import YOLO
+        self.weights = weights
+        self.model = YOLO(weights, task='detect')
+        self.options = dict(conf=conf, max_det=max_det, iou=iou, verbose=False)
+        # Overlays on different screens may share one model
+        self.lock = threading.Lock()
+
+    def results(self, pixels):
+        return self.model(pixels, stream=True, **self.options)
+
+    def extract(self, result):
+        with tracing.span('box_extraction'):
+            return boxes_from_result(result)
+
+    def detect(self, pixels):
+        with self.lock, tracing.span('model', backend=self.name):
+            elements = [self.extract(result) for result in self.results(pixels)]
+        return np.concatenate(elements) if elements else empty_boxes()
+
+    def detect_batch(self, frames):
+        # A list of frames goes through the model as a single batch
+        with self.lock, tracing.span('model', backend=self.name, batch=len(frames)):
+            return [self.extract(result) for result in self.results(list(frames))]
+
+
+class OnnxBackend(UltralyticsBackend):
+    name = 'onnx'
+
+    def __init__(self, weights, int8=False, **options):
+        super().__init__(export_onnx(weights, int8), **options)
+
+
+class OpenVinoBackend(UltralyticsBackend):
+    name = 'openvino'
+
+    def __init__(self, weights, int8=False, calibration_data=None, **options):
+        super().__init__(export_openvino(weights, int8, calibration_data), **options)
+
+
+def export_onnx(weights, int8=False):
+    # Exports once next to the weights and reuses the file until the weights change
+    stem = os.path.splitext(weights)[0]
+    exported = stem + '.onnx'
+    if not is_fresh(exported, weights):
+        from ultralytics import YOLO
+        print(f"Exporting {weights} to ONNX")
+        exported = YOLO(weights).export(format='onnx', dynamic=True, simplify=True)
+    if not int8:
+        return exported
+
+    quantized = stem + '.int8.onnx'
+    if not is_fresh(quantized, exported):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print(f"Quantizing {exported} to int8")
+        quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+    return quantized
+
+
+def export_openvino(weights, int8=False, calibration_data=None):
+    stem = os.path.splitext(weights)[0]
+    exported = stem + ('_int8' if int8 else '') + '_openvino_model'
+    if not is_fresh(exported, weights):
+        from ultralytics import YOLO
+        print(f"Exporting {weights} to OpenVINO{' int8' if int8 else ''}")
+        options = dict(format='openvino', int8=int8)
+        if calibration_data:
+            options['data'] = calibration_data
+        exported = YOLO(weights).export(**options)
+    return exported
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxBackend.name: OnnxBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+
+def load_backend(name, weights, int8=False, calibration_data=None, tile_size=None, tile_overlap=0.25, **options):
+    # Falls back to the plain PyTorch model when the requested runtime is
+    # missing or the export fails. A tile_size wraps it for tiled inference.
+    backend = load_runtime(name, weights, int8, calibration_data, **options)
+    if tile_size:
+        from tiled_inference import TiledBackend
+        backend = TiledBackend(backend, tile_size, tile_overlap)
+    return backend
+
+
+def load_runtime(name, weights, int8, calibration_data, **options):
+    if name not in BACKENDS:
+        print(f"Unknown inference backend '{name}', using {UltralyticsBackend.name}")
+        name = UltralyticsBackend.name
+    try:
+        if name == OnnxBackend.name:
+            return OnnxBackend(weights, int8=int8, **options)
+        if name == OpenVinoBackend.name:
+            return OpenVinoBackend(weights, int8=int8, calibration_data=calibration_data, **options)
+    except Exception as e:
+        print(f"Could not load the {name} backend ({e}), falling back to {UltralyticsBackend.name}")
+    return UltralyticsBackend(weights, **options)
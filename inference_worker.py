@@ -0,0 +1,172 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import threading
+
+import numpy as np
+
+from inference_backends import load_backend
+import tracing
+
+
+def worker_main(conn, backend_name, weights, options):
+    # Runs in the worker process: owns the model, reads frames from the
+    # shared memory block named in each request and answers with boxes
+    backend = load_backend(backend_name, weights, **options)
+    conn.send(('ready', backend.name))
+
+    frames = None
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            _, name, height, width = message
+            if frames is None or frames.name != name:
+                if frames is not None:
+                    frames.close()
+                frames = shared_memory.SharedMemory(name=name)
+            pixels = np.ndarray((height, width, 3), dtype=np.uint8, buffer=frames.buf)
+            try:
+                boxes = backend.detect(pixels).astype(np.int32)
+                # Spans recorded here travel back with the reply
+                conn.send(('boxes', boxes, tracing.collect()))
+            except Exception as e:
+                conn.send(('error', repr(e), tracing.collect()))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if frames is not None:
+            frames.close()
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class InferenceWorker:
+    # Same detect() interface as the in-process backends, but the model runs
+    # in its own process so its Python pre/post-processing never holds the
+    # GUI process's GIL. Frames travel through one reusable shared memory
+    # block; the worker is restarted if it dies, and replaced by an
+    # in-process backend if it keeps dying.
+
+    def __init__(self, backend_name, weights, startup_timeout=300, max_restarts=3, **options):
+        self.backend_name = backend_name
+        self.weights = weights
+        self.options = options
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts  # failed requests in a row before inference moves in-process
+        self.failures = 0
+        self.fallback = None
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.frames = None
+        self.process = None
+        self.conn = None
+        self.name = None
+        self.start()
+
+    def start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=worker_main, args=(child_conn, self.backend_name, self.weights, self.options),
+            name='univim-inference', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+        if not self.conn.poll(self.startup_timeout):
+            self.stop_process()
+            raise WorkerCrashed("Inference worker did not start in time")
+        try:
+            _, backend_name = self.conn.recv()
+        except EOFError:
+            self.stop_process()
+            raise WorkerCrashed("Inference worker exited while loading the model")
+        self.name = f"{backend_name} (worker)"
+
+    def restart(self):
+        print("Inference worker died, restarting it")
+        self.stop_process()
+        self.start()
+
+    def stop_process(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def frame_buffer(self, height, width):
+        size = height * width * 3
+        if self.frames is None or self.frames.size < size:
+            self.release_frames()
+            self.frames = shared_memory.SharedMemory(create=True, size=size)
+        return np.ndarray((height, width, 3), dtype=np.uint8, buffer=self.frames.buf)
+
+    def release_frames(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames.unlink()
+            self.frames = None
+
+    def request(self, height, width):
+        self.conn.send(('detect', self.frames.name, height, width))
+        while not self.conn.poll(0.5):
+            if not self.process.is_alive():
+                raise WorkerCrashed("Inference worker exited during detection")
+        try:
+            return self.conn.recv()
+        except EOFError:
+            raise WorkerCrashed("Inference worker closed its connection")
+
+    def detect(self, pixels):
+        if self.fallback is not None:
+            return self.fallback.detect(pixels)
+        height, width = pixels.shape[:2]
+        with self.lock:
+            # The only copy of the frame: straight into the shared block
+            self.frame_buffer(height, width)[:] = pixels
+            reply = None
+            while reply is None:
+                try:
+                    if self.conn is None or not self.process.is_alive():
+                        raise WorkerCrashed("Inference worker is not running")
+                    reply = self.request(height, width)
+                except (WorkerCrashed, BrokenPipeError, EOFError, OSError) as e:
+                    self.failures += 1
+                    if self.failures > self.max_restarts:
+                        return self.run_in_process(pixels, e)
+                    try:
+                        self.restart()
+                    except WorkerCrashed as e:
+                        print(e)
+            self.failures = 0
+
+        kind, payload, spans = reply
+        tracing.ingest(spans)
+        if kind == 'error':
+            raise RuntimeError(f"Inference failed in the worker: {payload}")
+        return payload.astype(np.int64)
+
+    def run_in_process(self, pixels, error):
+        # The worker keeps dying, give up on it for this session
+        print(f"Inference worker failed {self.failures} times in a row ({error}), running inference in-process")
+        self.stop_process()
+        self.release_frames()
+        self.fallback = load_backend(self.backend_name, self.weights, **self.options)
+        self.name = self.fallback.name
+        return self.fallback.detect(pixels)
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None and self.process is not None and self.process.is_alive():
+                try:
+                    self.conn.send(('stop',))
+                except (BrokenPipeError, OSError):
+                    pass
+                self.process.join(timeout=2)
+            self.stop_process()
+            self.release_frames()
@@ -0,0 +1,117 @@
+from collections import deque
+import itertools
+import signal
+import sys
+import threading
+import time
+
+import config
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': 100}
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+class InputLog:
+    # Log for the pynput hook callbacks. Those run inside the OS input hooks,
+    # so logging there only appends a tuple to a bounded deque (atomic under
+    # the GIL, no lock, no I/O); formatting and writing happen on a drain thread
+
+    def __init__(self, level=INFO, capacity=4096, echo=False, max_lines_per_second=50, interval=0.5,
+                 dump_signal=getattr(signal, 'SIGUSR1', None)):
+        self.level = level
+        self.records = deque(maxlen=capacity)  # (sequence, time, level, event, fields)
+        self.sequence = itertools.count()
+        self.echo = echo
+        self.max_lines_per_second = max_lines_per_second
+        self.interval = interval
+        self.dump_signal = dump_signal
+        self.next_to_echo = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def log(self, level, event, **fields):
+        if level >= self.level:
+            self.records.append((next(self.sequence), time.time(), level, event, fields))
+
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+
+    def format(self, record):
+        _, stamp, level, event, fields = record
+        clock = time.strftime('%H:%M:%S', time.localtime(stamp))
+        text = ' '.join(f"{key}={value}" for key, value in fields.items())
+        return f"{clock}.{int(stamp % 1 * 1000):03d} {LEVEL_NAMES.get(level, level):<7} {event} {text}".rstrip()
+
+    def snapshot(self):
+        # deque.copy() runs entirely in C, so it can't see a half-done append
+        return self.records.copy()
+
+    def dump(self, file=None):
+        file = file or sys.stderr
+        records = self.snapshot()
+        print(f"--- input log: {len(records)} records ---", file=file)
+        for record in records:
+            print(self.format(record), file=file)
+        print("--- end of input log ---", file=file, flush=True)
+
+    def drain(self, file=None):
+        # Echoes records added since the last call, at most
+        # max_lines_per_second * interval of them per call
+        file = file or sys.stderr
+        records = [r for r in self.snapshot() if r[0] >= self.next_to_echo]
+        if not records:
+            return
+        if records[0][0] > self.next_to_echo:
+            print(f"input log: {records[0][0] - self.next_to_echo} records dropped, buffer full", file=file)
+        budget = max(1, int(self.max_lines_per_second * self.interval))
+        for record in records[:budget]:
+            print(self.format(record), file=file)
+        if len(records) > budget:
+            print(f"input log: {len(records) - budget} records not echoed (rate limit)", file=file)
+        file.flush()
+        self.next_to_echo = records[-1][0] + 1
+
+    def start(self):
+        # Call from the main thread before any other thread exists: the dump
+        # signal gets blocked here, every later thread inherits that, and the
+        # drain thread picks it up with sigtimedwait
+        if self.dump_signal is not None and hasattr(signal, 'sigtimedwait'):
+            signal.pthread_sigmask(signal.SIG_BLOCK, {self.dump_signal})
+        else:
+            self.dump_signal = None
+        self.thread = threading.Thread(target=self.run, name='input-log', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.dump_signal is not None:
+                if signal.sigtimedwait([self.dump_signal], self.interval) is not None:
+                    self.dump()
+            else:
+                self.stop_event.wait(self.interval)
+            if self.echo:
+                self.drain()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.echo:
+            self.drain()
+
+
+log = InputLog(LEVELS.get(config.INPUT_LOG_LEVEL, INFO), config.INPUT_LOG_SIZE, config.INPUT_LOG_ECHO)
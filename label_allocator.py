@@ -0,0 +1,161 @@
+import heapq
+import json
+import os
+import threading
+
+import numpy as np
+
+from box_utils import SCORE, SCORE_SCALE
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def free_slots(taken, alphabet=ALPHABET):
+    # The shortest labels that are neither a prefix nor an extension of a
+    # taken label, shallowest first. Together they make up what is left of
+    # the code space.
+    prefixes = {''} | {label[:i] for label in taken for i in range(len(label))}
+    taken = set(taken)
+    order = {char: i for i, char in enumerate(alphabet)}
+    slots = []
+    for prefix in sorted(prefixes, key=lambda p: (len(p), [order.get(char, 0) for char in p])):
+        for char in alphabet:
+            label = prefix + char
+            if label not in prefixes and label not in taken:
+                slots.append(label)
+    return sorted(slots, key=len)
+
+
+def prefix_code(weights, slots=None, alphabet=ALPHABET):
+    # Labels for elements with the given weights (how likely each is the one
+    # clicked), built in the free `slots`: k-ary Huffman coding, so the
+    # expected number of keys to type is as low as the alphabet allows and a
+    # heavier element never gets a longer label than a lighter one. Equal
+    # weights keep the given order. Returns None when no slot is left.
+    count = len(weights)
+    if count == 0:
+        return []
+    if slots is None:
+        slots = list(alphabet)
+    if not slots:
+        return None
+    # (weight, tie breaker, node): a node is an element index or a list of
+    # child nodes, lightest first. On equal weights later elements and
+    # merged nodes sink deeper.
+    heap = [(float(weight), -i, i) for i, weight in enumerate(weights)]
+    heapq.heapify(heap)
+    excess = count - len(slots)
+    if excess > 0:
+        # The first merge takes just enough nodes that every later one can
+        # take a full alphabet and still end on exactly one tree per slot
+        size = (excess - 1) % (len(alphabet) - 1) + 2
+        merges = 0
+        while len(heap) > len(slots):
+            children = [heapq.heappop(heap) for _ in range(size)]
+            merges += 1
+            heapq.heappush(heap, (sum(child[0] for child in children), merges, [child[2] for child in children]))
+            size = len(alphabet)
+
+    # Heaviest trees go to the shallowest slots
+    trees = sorted(heap, key=lambda tree: (-tree[0], -tree[1]))
+    labels = [None] * count
+    stack = [(slot, tree[2]) for slot, tree in zip(slots, trees)]
+    while stack:
+        label, node = stack.pop()
+        if isinstance(node, list):
+            stack.extend((label + char, child) for char, child in zip(alphabet, reversed(node)))
+        else:
+            labels[node] = label
+    return labels
+
+
+def expected_keystrokes(weights, labels):
+    total = float(np.sum(weights))
+    if not labels or total <= 0:
+        return 0.0
+    return float(np.dot(weights, [len(label) for label in labels])) / total
+
+
+class ClickHistory:
+    # Where the user clicked before, per application: click counts on a
+    # coarse grid over the screen that fade with a half-life of `half_life`
+    # clicks, kept on disk across restarts. Also keeps the running keystroke
+    # count per click, the number the label allocation tries to bring down.
+
+    def __init__(self, path=None, columns=32, rows=18, half_life=200, max_entries=4096):
+        self.path = path
+        self.columns = columns
+        self.rows = rows
+        self.half_life = half_life
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.counts = {}  # 'context|column|row' -> (count, click number it was last updated at)
+        self.clicks = 0
+        self.keystrokes = 0
+        self.dirty = False
+        if path:
+            self.load()
+
+    def cells(self, context, boxes, frame_size):
+        width, height = frame_size
+        columns = np.clip((boxes[:, 0] + boxes[:, 2] // 2) * self.columns // max(width, 1), 0, self.columns - 1)
+        rows = np.clip((boxes[:, 1] + boxes[:, 3] // 2) * self.rows // max(height, 1), 0, self.rows - 1)
+        return [f'{context}|{column}|{row}' for column, row in zip(columns.tolist(), rows.tolist())]
+
+    def decayed(self, entry):
+        count, at = entry
+        return count * 0.5 ** ((self.clicks - at) / self.half_life)
+
+    def scores(self, context, boxes, frame_size):
+        # Faded click count of the cell each box is centred in
+        keys = self.cells(context, boxes, frame_size)
+        with self.lock:
+            return np.array([self.decayed(self.counts[key]) if key in self.counts else 0.0 for key in keys])
+
+    def record(self, context, box, frame_size, keystrokes):
+        key = self.cells(context, np.asarray(box, dtype=np.int64).reshape(1, -1), frame_size)[0]
+        with self.lock:
+            count = self.decayed(self.counts.pop(key)) if key in self.counts else 0.0
+            self.clicks += 1
+            self.keystrokes += keystrokes
+            self.counts[key] = (count + 1, self.clicks)
+            if len(self.counts) > self.max_entries:
+                # Drop the faintest cells
+                ranked = sorted(self.counts, key=lambda k: self.decayed(self.counts[k]))
+                for stale in ranked[:len(self.counts) - self.max_entries]:
+                    del self.counts[stale]
+            self.dirty = True
+
+    def average_keystrokes(self):
+        return self.keystrokes / self.clicks if self.clicks else 0.0
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.clicks = int(data['clicks'])
+            self.keystrokes = int(data['keystrokes'])
+            self.counts = {key: (float(count), int(at)) for key, (count, at) in data['counts'].items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable click history {self.path}: {e}")
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            data = {'clicks': self.clicks, 'keystrokes': self.keystrokes, 'counts': dict(self.counts)}
+            self.dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary, self.path)
+
+
+def click_weights(boxes, history_scores, confidence_floor=0.05, history_weight=4.0):
+    # Relative likelihood of each box being the one clicked: the model's
+    # confidence that it's an element at all, raised by clicks on that spot
+    confidence = boxes[:, SCORE] / SCORE_SCALE + confidence_floor
+    return confidence * (1 + history_weight * history_scores)
@@ -0,0 +1,87 @@
+class LabelNode:
+    __slots__ = ('children', 'indices', 'element')
+
+    def __init__(self):
+        self.children = {}
+        self.indices = []  # every element whose label passes through this node
+        self.element = None  # element whose label ends here
+
+
+# Stands in for every character typed past the point where nothing matched
+NO_MATCH = LabelNode()
+
+
+class LabelIndex:
+    # Prefix trie over the hint labels. Behaves like the list of labels, and
+    # tracks the typed prefix as a path of nodes so narrowing and backspace
+    # only walk the characters that changed.
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.root = LabelNode()
+        for index, label in enumerate(self.labels):
+            node = self.root
+            node.indices.append(index)
+            for char in label:
+                node = node.children.setdefault(char, LabelNode())
+                node.indices.append(index)
+            node.element = index
+        self.path = [self.root]
+        self.prefix = ''
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        return self.labels[index]
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def push(self, char):
+        child = self.path[-1].children.get(char)
+        if child is None:
+            return False
+        self.path.append(child)
+        self.prefix += char
+        return True
+
+    def pop(self):
+        if len(self.path) > 1:
+            self.path.pop()
+            self.prefix = self.prefix[:-1]
+
+    def reset(self):
+        del self.path[1:]
+        self.prefix = ''
+
+    def set_prefix(self, prefix):
+        # Keep the part of the path shared with the current prefix
+        common = 0
+        for old, new in zip(self.prefix, prefix):
+            if old != new:
+                break
+            common += 1
+        del self.path[common + 1:]
+        self.prefix = self.prefix[:common]
+
+        matched = True
+        for char in prefix[common:]:
+            if matched and self.push(char):
+                continue
+            # Keep the prefix anyway, with nothing visible, so another index
+            # sharing the label space can still match it
+            matched = False
+            self.path.append(NO_MATCH)
+            self.prefix += char
+        return matched
+
+    def matches(self):
+        return self.path[-1].indices
+
+    def unique_match(self):
+        # Element whose label is exactly the typed prefix, once nothing else can match
+        node = self.path[-1]
+        if node.children or len(self.path) == 1:
+            return None
+        return node.element
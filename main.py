@@ -1,15 +1,27 @@
 import sys
 import threading
-from overlay_window import OverlayWindow
+import multiprocessing
+from overlay_manager import OverlayManager
 from global_hotkeys import GlobalHotKeys
 from global_mouse import GlobalMouse
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import Qt
+import time
+import config
+import tracing
+from input_log import log as input_log
+from screen_capture import close_capture_backend
+
+def report_latency(name, stamp):
+    # Time from the pynput callback to the overlay having handled the event
+    tracing.record(name.lower().replace(' ', '_'), stamp)
+    print(f"{name} handled in {(time.perf_counter() - stamp) * 1000:.2f} ms")
 
 def main():
+    input_log.start()  # first, so every thread inherits its signal mask
     app = QApplication(sys.argv)
 
-    overlay = OverlayWindow()
+    overlay = OverlayManager()
     overlay.activate_overlay()
 
     hotkeys = GlobalHotKeys()
@@ -20,47 +32,56 @@ def main():
     mouse_thread = threading.Thread(target=mouse.start_listening)
     mouse_thread.start()
 
-    # Connect signals
-    hotkeys.key_pressed_signal.connect(overlay.handle_key_press)
-    hotkeys.grid_view_signal.connect(overlay.toggle_grid_view)
-    hotkeys.stop_grid_view_signal.connect(overlay.stop_grid_view)
-
-    def check_events():
-        if hotkeys.start_event.is_set():
-            overlay.start_element_detection()
-            hotkeys.set_detection_active(True)
-            hotkeys.start_event.clear()
-        
-        if hotkeys.stop_event.is_set():
-            overlay.stop_element_detection()
-            overlay.stop_grid_view()  # Also stop grid view when ESC is pressed
-            hotkeys.set_detection_active(False)
-            hotkeys.is_grid_view_active = False
-            hotkeys.stop_event.clear()
-        
-        if mouse.stop_event.is_set():
-            overlay.stop_element_detection()
-            overlay.stop_grid_view()  # Also stop grid view on mouse click
-            hotkeys.set_detection_active(False)
-            hotkeys.is_grid_view_active = False
-            mouse.stop_event.clear()
-
-        if hotkeys.exit_event.is_set():
-            app.quit()
-
-    timer = QTimer()
-    timer.timeout.connect(check_events)
-    timer.start(10)
+    # Connect signals. The listeners emit from their own threads, so every
+    # connection is queued and the UI thread only wakes up when input arrives
+    queued = Qt.QueuedConnection
+    hotkeys.key_pressed_signal.connect(overlay.handle_key_press, queued)
+    hotkeys.grid_view_signal.connect(overlay.toggle_grid_view, queued)
+    hotkeys.stop_grid_view_signal.connect(overlay.stop_grid_view, queued)
+    hotkeys.first_shift_signal.connect(overlay.on_first_shift, queued)
+    hotkeys.scroll_signal.connect(overlay.on_scroll, queued)
+    mouse.scroll_signal.connect(overlay.on_scroll, queued)
+
+    def on_start_detection(stamp):
+        tracing.mark('activation', stamp)
+        overlay.start_element_detection()
+        hotkeys.set_detection_active(True)
+        report_latency("Start detection", stamp)
+
+    def on_stop(stamp):
+        overlay.stop_element_detection()
+        overlay.stop_grid_view()  # Also stop grid view on ESC or mouse click
+        hotkeys.set_detection_active(False)
+        hotkeys.is_grid_view_active = False
+        report_latency("Stop", stamp)
+        if tracing.enabled:
+            print(tracing.format_summary())  # rolling percentiles over recent activations
+
+    hotkeys.start_detection_signal.connect(on_start_detection, queued)
+    hotkeys.stop_detection_signal.connect(on_stop, queued)
+    mouse.click_signal.connect(on_stop, queued)
+    hotkeys.exit_signal.connect(app.quit, queued)
 
     exit_code = app.exec_()
 
+    overlay.close_ai_model()
+    close_capture_backend()
+
+    if tracing.enabled:
+        tracing.export_chrome_trace(config.TRACE_PATH)
+        print(f"Trace written to {config.TRACE_PATH}")
+        print(tracing.format_summary())
+
     hotkeys.stop_listening()
     hotkey_thread.join()
 
     mouse.stop_listening()
     mouse_thread.join()
 
+    input_log.stop()
+
     sys.exit(exit_code)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # the inference worker is spawned from this executable
     main()
@@ -0,0 +1,156 @@
+from functools import partial
+
+import numpy as np
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QCursor, QGuiApplication
+
+import config
+from detection_scheduler import DetectionScheduler
+from box_tracker import BoxTracker, TakenLabels
+from window_memory import WindowMemory
+from label_allocator import ClickHistory, prefix_code
+from overlay_window import OverlayWindow
+
+
+class OverlayManager(QObject):
+    # One OverlayWindow per screen. Every screen captures and detects on its
+    # own, while hint labels are handed out from one global label space so a
+    # typed prefix selects a single element across all screens.
+
+    def __init__(self):
+        super().__init__()
+        self.overlays = []
+        self.model_owners = []
+        # Labels in use, shared by every screen's tracker
+        self.taken_labels = TakenLabels()
+        self.current_input = ''
+        # One scheduler for all screens: screens sharing a model take turns
+        # on it. By default there is one model, so one inference at a time
+        self.scheduler = DetectionScheduler()
+        self.window_memory = None
+        if config.WINDOW_MEMORY:
+            self.window_memory = WindowMemory(config.WINDOW_MEMORY_PATH, config.WINDOW_MEMORY_MAX_ENTRIES,
+                                              config.WINDOW_MEMORY_MAX_BYTES)
+        self.click_history = ClickHistory(config.CLICK_HISTORY_PATH) if config.CLICK_HISTORY else None
+
+        screens = QGuiApplication.screens()
+        model_count = min(len(screens), config.MAX_INFERENCE_MODELS)
+        for i, screen in enumerate(screens):
+            overlay = OverlayWindow(screen=screen, preload_model=i < model_count, label_space=self,
+                                    scheduler=self.scheduler, tracker=BoxTracker(self.taken_labels),
+                                    window_memory=self.window_memory, click_history=self.click_history)
+            if i < model_count:
+                self.model_owners.append(overlay)
+            else:
+                # More screens than models: share one round-robin
+                owner = self.model_owners[i % model_count]
+                owner.model_loaded_signal.connect(partial(self.share_model, owner, overlay))
+            self.overlays.append(overlay)
+
+    def share_model(self, owner, overlay):
+        overlay.ai_model = owner.ai_model
+
+    def elements_to_come(self, overlay, estimate):
+        # Boxes the other screens still have to label, so the screen that
+        # labels first leaves them their share of the short labels. Screens
+        # without a finished pass yet are guessed to find `estimate`.
+        return sum(other.elements_to_come(estimate) for other in self.overlays if other is not overlay)
+
+    def relabel(self, overlay, elements, weights):
+        # The code space is full: labels every screen's boxes afresh, in one
+        # prefix code. `elements` are the boxes `overlay` is about to show,
+        # returns their labels.
+        screens = [(other, other.clickable_elements, other.shown_weights())
+                   for other in self.overlays if other is not overlay and other.is_overlay_active]
+        screens.append((overlay, elements, weights))
+        for other, _, _ in screens:
+            other.tracker.reset()
+        labels = prefix_code(np.concatenate([w for _, _, w in screens]), alphabet=config.LABEL_ALPHABET)
+        start = 0
+        for other, boxes, _ in screens:
+            own = labels[start:start + len(boxes)]
+            start += len(boxes)
+            other.tracker.assign(boxes, own)
+            if other is not overlay:
+                other.show_labels(own)
+        print(f"Relabelled {len(labels)} elements on {len(screens)} screens")
+        return own  # `overlay` came last
+
+    def close_ai_model(self):
+        self.scheduler.close()
+        for overlay in self.model_owners:
+            overlay.close_ai_model()
+
+    def activate_overlay(self):
+        for overlay in self.overlays:
+            overlay.activate_overlay()
+
+    def overlay_at_cursor(self):
+        screen = QGuiApplication.screenAt(QCursor.pos())
+        for overlay in self.overlays:
+            if overlay.target_screen is screen:
+                return overlay
+        return self.overlays[0]
+
+    def start_element_detection(self):
+        self.current_input = ''
+        for overlay in self.overlays:
+            overlay.start_element_detection()
+
+    def stop_element_detection(self):
+        self.current_input = ''
+        for overlay in self.overlays:
+            overlay.stop_element_detection()
+
+    def on_scroll(self):
+        # Whatever scrolled, overlays where nothing moved find no offset and keep their hints
+        for overlay in self.overlays:
+            overlay.on_scroll()
+
+    def on_first_shift(self):
+        for overlay in self.overlays:
+            overlay.on_first_shift()
+
+    def toggle_grid_view(self):
+        # The grid only covers one screen, the one under the cursor
+        active = [overlay for overlay in self.overlays if overlay.is_grid_view_active]
+        for overlay in active or [self.overlay_at_cursor()]:
+            overlay.toggle_grid_view()
+
+    def stop_grid_view(self):
+        for overlay in self.overlays:
+            overlay.stop_grid_view()
+
+    def handle_key_press(self, key):
+        for overlay in self.overlays:
+            if overlay.is_grid_view_active:
+                overlay.handle_key_press(key)
+                return
+
+        if not any(overlay.is_overlay_active for overlay in self.overlays):
+            return
+        if key == 'esc':
+            self.stop_element_detection()
+        elif key == 'backspace':
+            self.update_prefix(self.current_input[:-1])
+        elif key.isalpha():
+            self.update_prefix(self.current_input + key.lower())
+
+    def update_prefix(self, prefix):
+        active = [overlay for overlay in self.overlays if overlay.is_overlay_active]
+        matched = [overlay for overlay in active if overlay.apply_label_prefix(prefix)]
+        if not matched:
+            # If no matches anywhere, keep all labels visible
+            for overlay in active:
+                overlay.apply_label_prefix('')
+            self.current_input = ''
+            return
+
+        self.current_input = prefix
+        # Labels are unique across screens, so an exact match can only be on one of them
+        for overlay in matched:
+            index = overlay.element_labels.unique_match()
+            if index is not None:
+                overlay.click_element(index)
+                self.stop_element_detection()
+                return
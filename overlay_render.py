@@ -0,0 +1,96 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QBrush, QColor, QFontMetrics, QPainter, QPen, QPixmap
+
+CYAN = QColor(0, 255, 255)
+CELL_FILL = QColor(0, 255, 255, 20)
+MATCH_HIGHLIGHT = QColor(0, 255, 0, 128)
+TEXT_COLOR = QColor(0, 0, 0)
+
+
+class RenderCache:
+    # Pens, font metrics, hint badges and whole-window layers that stay the
+    # same between repaints, so paintEvent mostly just blits pixmaps
+
+    def __init__(self, font, max_badges=8192):
+        self.font = font
+        self.metrics = QFontMetrics(font)
+        self.font_height = self.metrics.height()
+        self.padding = int(self.font_height * 0.1)
+        self.max_badges = max_badges
+        self.device_pixel_ratio = 1.0
+
+        self.cell_pen = QPen(CYAN)
+        self.cell_brush = QBrush(CELL_FILL)
+        self.border_pen = QPen(CYAN)
+        self.border_pen.setWidth(2)
+
+        self.badges = {}
+        self.layers = {}
+
+    def set_device_pixel_ratio(self, ratio):
+        if ratio != self.device_pixel_ratio:
+            self.device_pixel_ratio = ratio
+            self.badges.clear()
+            self.layers.clear()
+
+    def new_pixmap(self, width, height):
+        pixmap = QPixmap(int(width * self.device_pixel_ratio), int(height * self.device_pixel_ratio))
+        pixmap.setDevicePixelRatio(self.device_pixel_ratio)
+        pixmap.fill(Qt.transparent)
+        return pixmap
+
+    def badge_size(self, label):
+        return self.metrics.width(label) + 2 * self.padding, self.font_height + 2 * self.padding
+
+    def badge(self, label, matched=0):
+        key = (label, matched)
+        pixmap = self.badges.get(key)
+        if pixmap is None:
+            if len(self.badges) >= self.max_badges:
+                self.badges.clear()
+            pixmap = self.render_badge(label, matched)
+            self.badges[key] = pixmap
+        return pixmap
+
+    def render_badge(self, label, matched):
+        width, height = self.badge_size(label)
+        pixmap = self.new_pixmap(width, height)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setFont(self.font)
+
+        painter.fillRect(0, 0, width, height, CYAN)
+        painter.setPen(TEXT_COLOR)
+        text_y = height - self.padding - self.metrics.descent()
+        painter.drawText(self.padding, text_y, label)
+
+        # Highlight matched part of the label
+        if matched:
+            matched_text = label[:matched]
+            matched_width = self.metrics.width(matched_text)
+            painter.fillRect(0, 0, matched_width + 2 * self.padding, height, MATCH_HIGHLIGHT)
+            painter.setPen(TEXT_COLOR)
+            painter.drawText(self.padding, text_y, matched_text)
+
+        painter.end()
+        return pixmap
+
+    def layer(self, name, size, paint, token=None):
+        # Window-sized pixmap painted once by `paint(painter)` and reused until
+        # the window size or `token` changes
+        cached = self.layers.get(name)
+        if cached is not None and cached[0] == size and cached[1] is token:
+            return cached[2]
+
+        pixmap = self.new_pixmap(size.width(), size.height())
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        paint(painter)
+        painter.end()
+        self.layers[name] = (size, token, pixmap)
+        return pixmap
+
+    def release_layers(self):
+        # A layer is as big as the window (33 MB at 4K), don't keep them
+        # around while the overlay shows nothing
+        self.layers.clear()
@@ -1,11 +1,31 @@
 from PyQt5.QtWidgets import QMainWindow, QApplication
 from PyQt5.QtCore import Qt, pyqtSignal, QRect, QThreadPool, QRunnable, QTimer, QPoint
-from PyQt5.QtGui import QGuiApplication, QPainter, QColor, QPen, QFont, QFontMetrics, QScreen, QBrush
+from PyQt5.QtGui import QGuiApplication, QPainter, QColor, QFont, QFontMetrics, QScreen, QBrush, QCursor
 import sys
 import threading
 from pynput.mouse import Controller as MouseController, Button
-import itertools
 import platform
+import numpy as np
+from functools import partial
+import time
+import config
+import tracing
+from screen_capture import grab_screen, grab_region
+from label_index import LabelIndex
+from overlay_render import RenderCache
+from detection_cache import DetectionCache, frame_signature
+from tile_diff import TileChangeTracker
+from prefetch import PrefetchPolicy
+from detection_scheduler import DetectionScheduler
+from scroll_tracking import estimate_scroll
+from box_tracker import BoxTracker
+from active_window import active_window
+from window_memory import WindowMemory, window_key
+from label_allocator import ClickHistory, click_weights, expected_keystrokes, free_slots, prefix_code
+from inference_backends import load_backend
+from inference_worker import InferenceWorker, WorkerCrashed
+from tiled_inference import drop_cut_boxes, focus_region
+from box_utils import filter_overlapping_boxes, boxes_from_result, empty_boxes, box_to_qrect, box_center, deduplicate_boxes, IncrementalFilter, with_scores
 
 class YOLOModelLoader(QRunnable):
     def __init__(self, callback):
@@ -13,21 +33,35 @@ class YOLOModelLoader(QRunnable):
         self.callback = callback
 
     def run(self):
-        from ultralytics import YOLO
-        model = YOLO("weights/cloud.pt")
+        options = dict(int8=config.INFERENCE_INT8, calibration_data=config.INT8_CALIBRATION_DATA,
+                       tile_size=config.INFERENCE_TILE_SIZE, tile_overlap=config.INFERENCE_TILE_OVERLAP)
+        model = None
+        if config.INFERENCE_WORKER:
+            try:
+                model = InferenceWorker(config.INFERENCE_BACKEND, config.MODEL_WEIGHTS, **options)
+            except WorkerCrashed as e:
+                print(f"{e}, running inference in-process instead")
+        if model is None:
+            model = load_backend(config.INFERENCE_BACKEND, config.MODEL_WEIGHTS, **options)
         self.callback(model)
 
 class OverlayWindow(QMainWindow):
     update_overlay_signal = pyqtSignal()
     model_loaded_signal = pyqtSignal()
     key_pressed_signal = pyqtSignal(str)
+    elements_ready_signal = pyqtSignal(object, int, bool, object)  # elements, detection generation, final, motion
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, screen=None, preload_model=True, label_space=None, scheduler=None,
+                 tracker=None, window_memory=None, click_history=None):
+        # OverlayManager passes the parts shared by all screens, the window
+        # makes its own of whatever isn't given
         super().__init__(parent)
+        self.target_screen = screen or QGuiApplication.primaryScreen()
         self.setup_window_properties()
-        self.initialize_variables()
+        self.initialize_variables(label_space, scheduler, tracker, window_memory, click_history)
         self.setup_signals()
-        self.preload_ai_model()
+        if preload_model:
+            self.preload_ai_model()
         self.mouse = MouseController()
         self.current_input = ''
         self.is_grid_view_active = False
@@ -38,7 +72,7 @@ class OverlayWindow(QMainWindow):
         self.zoom_height_percentage = 0.15
         self.zoomed_rect = None
         self.subgrid_divisions = 6
-        self.full_screenshot = None
+        self.capturing_region = False  # paint nothing while the zoomed cell is grabbed
 
     def setup_window_properties(self):
         self.setWindowFlags(Qt.Window | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
@@ -52,15 +86,42 @@ class OverlayWindow(QMainWindow):
         self.set_fullscreen_geometry()
 
     def set_fullscreen_geometry(self):
-        for screen in QGuiApplication.screens():
-            self.setGeometry(screen.geometry())
-            break  # Set to primary monitor
-
-    def initialize_variables(self):
-        self.clickable_elements = []
-        self.element_labels = []
+        self.setGeometry(self.target_screen.geometry())
+
+    def initialize_variables(self, label_space=None, scheduler=None, tracker=None, window_memory=None, click_history=None):
+        self.clickable_elements = empty_boxes()
+        self.element_labels = LabelIndex()
+        self.current_frame = None
+        self.detection_cache = DetectionCache(config.DETECTION_CACHE_SIZE)
+        self.tile_tracker = TileChangeTracker(config.DETECTION_TILE_SIZE)
+        self.detection_lock = threading.Lock()
+        self.scheduler = scheduler if scheduler is not None else DetectionScheduler()  # one lane per model
+        self.detection_generation = 0  # bumped by every activation and ESC
+        self.settled = None  # (frame, elements) of the last finished detection, the base for scroll updates
+        self.tracker = tracker if tracker is not None else BoxTracker()
+        self.expected_elements = 0  # boxes the last final pass found
+        self.click_history = click_history
+        if click_history is None and config.CLICK_HISTORY:
+            self.click_history = ClickHistory(config.CLICK_HISTORY_PATH)
+        self.window_memory = window_memory
+        if window_memory is None and config.WINDOW_MEMORY:
+            self.window_memory = WindowMemory(config.WINDOW_MEMORY_PATH, config.WINDOW_MEMORY_MAX_ENTRIES,
+                                              config.WINDOW_MEMORY_MAX_BYTES)
+        self.focused_window = None  # focused window when the screen was captured
+        self.window_key = None
+        self.tracked_frame = None  # frame the hints on screen were detected (or moved) for
+        self.live_ticks = 0
+        self.live_timer = QTimer(self)
+        self.live_timer.timeout.connect(self.refresh_live)
+        self.scroll_timer = QTimer(self)
+        self.scroll_timer.setSingleShot(True)
+        self.scroll_timer.setInterval(config.SCROLL_UPDATE_INTERVAL)
+        self.scroll_timer.timeout.connect(self.refresh_after_scroll)
+        self.setup_prefetch()
         self.label_font = QFont("Arial", 12)
+        self.render_cache = RenderCache(self.label_font)
         self.is_overlay_active = False
+        self.label_space = label_space  # OverlayManager sharing one label space across screens
         self.ai_model = None
         self.thread_pool = QThreadPool()
         self.is_grid_view_active = False
@@ -69,6 +130,7 @@ class OverlayWindow(QMainWindow):
         self.update_overlay_signal.connect(self.update)
         self.model_loaded_signal.connect(self.on_ai_model_loaded)
         self.key_pressed_signal.connect(self.handle_key_press)
+        self.elements_ready_signal.connect(self.on_elements_ready)
 
     def preload_ai_model(self):
         loader = YOLOModelLoader(self.set_ai_model)
@@ -78,111 +140,448 @@ class OverlayWindow(QMainWindow):
         self.ai_model = model
         self.model_loaded_signal.emit()
 
+    def close_ai_model(self):
+        self.scheduler.close()
+        if self.window_memory is not None:
+            self.window_memory.save()
+        if self.click_history is not None:
+            self.click_history.save()
+        if hasattr(self.ai_model, 'close'):
+            self.ai_model.close()
+
     def on_ai_model_loaded(self):
-        print("AI model loaded successfully")
+        print(f"AI model loaded successfully ({self.ai_model.name} backend)")
+
+    def setup_prefetch(self):
+        self.prefetch_policy = PrefetchPolicy(config.PREFETCH_CPU_BUDGET, allow_on_battery=config.PREFETCH_ON_BATTERY)
+        self.prefetch_cancel_delay = 500  # ms, longer than the double press window
+
+        self.prefetch_timer = QTimer(self)
+        if config.PREFETCH_MODE == 'idle':
+            self.prefetch_timer.timeout.connect(self.prefetch_detection)
+            self.prefetch_timer.start(int(config.PREFETCH_IDLE_INTERVAL * 1000))
 
     def activate_overlay(self):
         print("Overlay window running")
         self.show()
 
     def capture_screen(self):
-        screen = QApplication.primaryScreen()
-        screenshot = screen.grabWindow(0)
-        screenshot.save('current_screen.png', 'png')
+        with tracing.span('capture'):
+            self.current_frame = grab_screen(self.target_screen)
+        if config.DEBUG_SCREENSHOT:
+            with tracing.span('encode'):
+                self.current_frame.save(config.DEBUG_SCREENSHOT_PATH)
 
     def start_element_detection(self):
         self.current_input = ''
+        self.detection_generation += 1
         if self.ai_model is None:
             print("AI model is not loaded yet. Please wait.")
-            QTimer.singleShot(1000, self.start_element_detection)
+            QTimer.singleShot(1000, partial(self.retry_element_detection, self.detection_generation))
             return
 
         self.capture_screen()
         self.is_overlay_active = True
-        threading.Thread(target=self.detect_clickable_elements).start()
+        self.settled = None
+        # Labels are chosen afresh for every activation, once shown they stay
+        self.tracker.reset()
+        self.focused_window = active_window() if self.window_memory is not None or self.click_history is not None else None
+        self.window_key = self.focused_window_key()
+        self.detect_current_frame()
+        if config.LIVE_REFRESH_INTERVAL > 0:
+            self.live_ticks = 0
+            self.live_timer.start(config.LIVE_REFRESH_INTERVAL)
+
+    def detect_current_frame(self, previous=None):
+        # Unchanged screen: reuse the boxes found last time instead of running the model
+        with tracing.span('frame_hash'):
+            frame_key = frame_signature(self.current_frame.pixels)
+        cached_elements = self.detection_cache.get(frame_key)
+        stats = self.detection_cache.stats()
+        print(f"Detection cache {'hit' if cached_elements is not None else 'miss'} "
+              f"(hits: {stats['hits']}, misses: {stats['misses']}, entries: {stats['entries']})")
+        recalled = None
+        if cached_elements is None and previous is None and self.window_key is not None:
+            # A window seen before: its old boxes, where they still show the same thing
+            with tracing.span('window_memory'):
+                recalled = self.window_memory.recall(self.window_key, self.current_frame.pixels)
+            if recalled is not None:
+                cached_elements, complete = recalled
+                print(f"Window memory hit: {len(cached_elements)} elements still match")
+                if complete:
+                    self.detection_cache.put(frame_key, cached_elements)
+        if cached_elements is not None and previous is None:
+            self.scheduler.cancel(self)
+            # Only a real detection replaces what the window memory holds
+            self.settle(cached_elements, remember=recalled is None)
+            self.show_elements(cached_elements)
+            if recalled is None or complete:
+                return
+            # Some boxes changed: the rest stay shown while the frame is
+            # detected in the background, for whatever is new there
+            cached_elements = None
+
+        # A prefetch or an earlier activation may already be detecting this exact screen
+        if self.scheduler.adopt(self, self.detection_generation, frame_key) is None:
+            if cached_elements is not None:
+                # Scrolled back to a known screen, only the hints' motion is still needed
+                run = partial(self.run_cached, elements=cached_elements, base=self.tracked_frame, frame=self.current_frame)
+            elif previous is not None:
+                run = partial(self.run_scroll_update, previous=previous, base=self.tracked_frame,
+                              frame=self.current_frame, frame_key=frame_key)
+            else:
+                run = partial(self.run_detection, frame=self.current_frame, frame_key=frame_key, focus=self.cursor_in_frame())
+            self.scheduler.submit(self, self.detection_generation, frame_key, run, lane=self.ai_model)
+
+    def retry_element_detection(self, generation):
+        # Still the same activation, no ESC or newer activation in between
+        if generation == self.detection_generation:
+            self.start_element_detection()
+
+    def run_detection(self, job, frame, frame_key, focus=None):
+        if config.PROGRESSIVE_DETECTION:
+            publish = lambda elements: self.publish_elements(job.generation, elements)
+            elements = self.detect_clickable_elements(frame, frame_key, job.cancel_event, publish=publish, focus=focus)
+        else:
+            elements = self.detect_clickable_elements(frame, frame_key, job.cancel_event)
+        if self.scheduler.finish(job) and elements is not None:
+            self.publish_elements(job.generation, elements, final=True)
+
+    def publish_elements(self, generation, elements, final=False, motion=None):
+        # Called from detection jobs, the elements are applied on the UI thread.
+        # `motion` is (frame, scroll): how the content moved since that frame
+        self.elements_ready_signal.emit(elements, generation, final, motion)
+
+    def on_elements_ready(self, elements, generation, final, motion):
+        # Results of a job superseded by ESC or a newer activation are dropped
+        if generation == self.detection_generation and self.is_overlay_active:
+            if final:
+                self.settle(elements)
+            # The motion only applies to hints still shown for that frame
+            scroll = motion[1] if motion is not None and motion[0] is self.tracked_frame else None
+            self.show_elements(elements, final, scroll)
+
+    def settle(self, elements, remember=True):
+        # `elements` are all there is on the current frame
+        self.settled = (self.current_frame, elements)
+        if remember and self.window_key is not None:
+            self.window_memory.remember(self.window_key, self.current_frame.pixels, elements)
+
+    def focused_window_key(self):
+        if self.window_memory is None or self.focused_window is None:
+            return None
+        origin = self.target_screen.geometry().topLeft()
+        return window_key(self.focused_window, (origin.x(), origin.y()),
+                          (self.current_frame.width(), self.current_frame.height()))
+
+    def click_context(self):
+        # Clicks are remembered per application
+        return self.focused_window.wm_class if self.focused_window is not None else ''
+
+    def motion_since(self, base, frame, previous_frame=None, scroll=None):
+        # Scroll from `base` (the frame the hints on screen belong to) to `frame`
+        if base is None:
+            return None
+        if base is not previous_frame:
+            with tracing.span('scroll_estimate'):
+                scroll = estimate_scroll(base.pixels, frame.pixels)
+        return (base, scroll) if scroll is not None else None
+
+    def on_scroll(self):
+        # Wheel or scroll keys while hints are shown: refresh them at most
+        # every SCROLL_UPDATE_INTERVAL ms for as long as the scrolling lasts
+        if config.SCROLL_TRACKING and self.is_overlay_active and not self.scroll_timer.isActive():
+            self.scroll_timer.start()
+
+    def refresh_after_scroll(self):
+        if not self.is_overlay_active or self.ai_model is None:
+            return
+        previous = self.settled
+        self.detection_generation += 1
+        self.capture_screen()
+        self.detect_current_frame(previous)
+
+    def refresh_live(self):
+        # Every LIVE_REFRESH_INTERVAL ms while hints are shown: hints follow
+        # scrolling right away, the model only runs every LIVE_INFERENCE_EVERY ticks
+        if not self.is_overlay_active or self.ai_model is None or self.scheduler.has_job(self):
+            return
+        self.live_ticks += 1
+        if self.live_ticks % config.LIVE_INFERENCE_EVERY == 0:
+            self.refresh_after_scroll()
+            return
+        self.detection_generation += 1
+        self.capture_screen()
+        run = partial(self.run_propagation, base=self.tracked_frame, elements=self.clickable_elements,
+                      frame=self.current_frame)
+        self.scheduler.submit(self, self.detection_generation, None, run, lane=self.ai_model)
+
+    def run_propagation(self, job, base, elements, frame):
+        # Moves the hints with the content without running the model. Not
+        # final: the next inference still starts from the last detected frame
+        motion = self.motion_since(base, frame)
+        if self.scheduler.finish(job) and motion is not None:
+            self.publish_elements(job.generation, motion[1].shift_boxes(elements), motion=motion)
+
+    def run_cached(self, job, elements, base, frame):
+        motion = self.motion_since(base, frame)
+        if self.scheduler.finish(job):
+            self.publish_elements(job.generation, elements, final=True, motion=motion)
+
+    def run_scroll_update(self, job, previous, base, frame, frame_key):
+        with tracing.span('scroll_estimate'):
+            scroll = estimate_scroll(previous[0].pixels, frame.pixels)
+        height, width = frame.pixels.shape[:2]
+        if scroll is None or scroll.exposed_fraction(width, height) > 0.5:
+            # No usable scroll offset, detect the frame the usual way
+            self.run_detection(job, frame, frame_key)
+            return
+
+        motion = self.motion_since(base, frame, previous[0], scroll)
+        publish = lambda elements: self.publish_elements(job.generation, elements, motion=motion)
+        elements = self.detect_after_scroll(previous[1], scroll, frame, frame_key, job.cancel_event, publish)
+        if self.scheduler.finish(job) and elements is not None:
+            self.publish_elements(job.generation, elements, final=True, motion=motion)
+
+    def detect_after_scroll(self, previous_elements, scroll, frame, frame_key, cancel_event, publish):
+        # Moves the previous frame's boxes along with the scrolled content and
+        # only runs the model on the rows the scroll exposed
+        top, bottom = scroll.exposed_rows()
+        print(f"Scrolled by {scroll.offset} px, re-detecting rows {top}-{bottom}")
+        with self.detection_lock:
+            stream = IncrementalFilter()
+            publish(stream.add(scroll.shift_boxes(previous_elements)))
+            if cancel_event.is_set():
+                return None
+            x0, y0, x1, y1 = scroll.band()
+            found = self.run_model(frame.pixels[y0:y1, x0:x1])
+            found[:, :2] += (x0, y0)
+            elements = stream.add(found[scroll.reaches_exposed(found)])
+            self.tile_tracker.remember_frame(frame.pixels, elements)
+            self.detection_cache.put(frame_key, elements)
+            return elements
+
+    def cursor_in_frame(self):
+        # Cursor position in the captured frame's pixels
+        position = QCursor.pos() - self.target_screen.geometry().topLeft()
+        ratio = self.target_screen.devicePixelRatio()
+        return position.x() * ratio, position.y() * ratio
+
+    def global_mouse_position(self, x, y):
+        # Overlay coordinates to the physical desktop coordinates the mouse
+        # controller uses. Qt keeps the screen origin in native pixels, only
+        # the size is scaled, the same as in cursor_in_frame
+        origin = self.target_screen.geometry().topLeft()
+        ratio = self.target_screen.devicePixelRatio()
+        return int(origin.x() + x * ratio), int(origin.y() + y * ratio)
+
+    def on_first_shift(self):
+        if config.PREFETCH_MODE == 'off':
+            return
+        if self.prefetch_detection():
+            # Drop the speculative work if the second press never comes
+            QTimer.singleShot(self.prefetch_cancel_delay, self.cancel_unused_prefetch)
+
+    def prefetch_detection(self):
+        if self.ai_model is None or self.is_overlay_active or self.is_grid_view_active:
+            return False
+        if self.scheduler.has_job(self) or not self.prefetch_policy.allows():
+            return False
+
+        frame = grab_screen(self.target_screen)
+        frame_key = frame_signature(frame.pixels)
+        if frame_key in self.detection_cache:
+            return False
+
+        run = partial(self.run_prefetch, frame=frame, frame_key=frame_key)
+        self.scheduler.submit(self, self.detection_generation, frame_key, run, kind='prefetch', lane=self.ai_model)
+        return True
+
+    def cancel_unused_prefetch(self):
+        # Only still a prefetch if no activation adopted it
+        self.scheduler.cancel(self, kind='prefetch')
+
+    def run_prefetch(self, job, frame, frame_key):
+        start = time.perf_counter()
+        elements = self.detect_clickable_elements(frame, frame_key, job.cancel_event)
+        self.prefetch_policy.record(time.perf_counter() - start)
+        if self.scheduler.finish(job) and elements is not None:
+            self.publish_elements(job.generation, elements, final=True)
 
     def stop_element_detection(self):
         print("Stopping element detection")
+        self.detection_generation += 1
+        self.scheduler.cancel(self)
+        self.scroll_timer.stop()
+        self.live_timer.stop()
+        self.settled = None
+        self.tracked_frame = None
         self.is_overlay_active = False
-        self.clickable_elements = []
-        self.element_labels = []
+        self.clickable_elements = empty_boxes()
+        self.element_labels = LabelIndex()
+        self.render_cache.release_layers()
         self.update()
 
-    def detect_clickable_elements(self):
-        results = self.ai_model("current_screen.png", conf=0.01, max_det=2048, iou=0.4, stream=True)
-        
-        for result in results:
-            all_elements = self.extract_elements_from_result(result)
-            filtered_elements = self.filter_overlapping_elements(all_elements)
-            
-            self.clickable_elements = filtered_elements
-            self.element_labels = self.generate_labels(len(filtered_elements))
-            self.update_overlay_signal.emit()
+    def detect_clickable_elements(self, frame, frame_key=None, cancel_event=None, publish=None, focus=None):
+        # Returns the filtered boxes, or None when cancel_event was set before the work finished.
+        # With `publish`, partial results are handed to it as each stage finishes, starting
+        # with the area around `focus`; boxes already published keep their position.
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        with self.detection_lock:
+            if cancelled():
+                return None
+
+            stream = IncrementalFilter() if publish is not None else None
+            plan = self.tile_tracker.plan(frame.pixels)
+            if plan.full:
+                all_elements = self.detect_full_frame(frame.pixels, stream, publish, focus, cancelled)
+                if all_elements is None:
+                    return None
+            else:
+                # Only re-detect the tiles that changed since the last pass
+                print(f"Re-detecting {len(plan.regions)} changed region(s)")
+                found = [self.tile_tracker.clean_boxes(plan)]
+                if stream is not None:
+                    publish(stream.add(found[0]))
+                for x0, y0, x1, y1 in self.regions_by_distance(plan.regions, focus):
+                    if cancelled():
+                        return None
+                    elements = self.run_model(frame.pixels[y0:y1, x0:x1])
+                    elements[:, :2] += (x0, y0)
+                    found.append(self.tile_tracker.dirty_boxes(plan, elements))
+                    if stream is not None:
+                        publish(stream.add(found[-1]))
+                all_elements = np.concatenate(found)
+            self.tile_tracker.remember(plan, all_elements)
+
+            if stream is not None:
+                filtered_elements = stream.boxes
+            else:
+                filtered_elements = self.filter_overlapping_elements(all_elements)
+            if frame_key is not None:
+                self.detection_cache.put(frame_key, filtered_elements)
+            return filtered_elements
+
+    def detect_full_frame(self, pixels, stream, publish, focus, cancelled):
+        height, width = pixels.shape[:2]
+        size = config.PROGRESSIVE_FOCUS_SIZE
+        if stream is None or focus is None or size <= 0 or (width <= size * 1.5 and height <= size * 1.5):
+            elements = self.run_model(pixels)
+            if stream is not None:
+                publish(stream.add(elements))
+            return elements
+
+        # Hints near the cursor first, then everything else
+        region = focus_region(focus, size, width, height)
+        x, y, w, h = region
+        near = drop_cut_boxes(self.run_model(pixels[y:y + h, x:x + w]), region, width, height) + (x, y, 0, 0, 0)
+        publish(stream.add(near))
+        if cancelled():
+            return None
+        elements = self.run_model(pixels)
+        publish(stream.add(elements))
+        elements = np.concatenate((near, elements))
+        return elements[deduplicate_boxes(elements)]
+
+    def regions_by_distance(self, regions, focus):
+        if focus is None:
+            return regions
+        def distance(region):
+            x0, y0, x1, y1 = region
+            dx = max(x0 - focus[0], 0, focus[0] - x1)
+            dy = max(y0 - focus[1], 0, focus[1] - y1)
+            return dx * dx + dy * dy
+        return sorted(regions, key=distance)
+
+    def run_model(self, pixels):
+        with tracing.span('inference', width=pixels.shape[1], height=pixels.shape[0]):
+            return with_scores(self.ai_model.detect(pixels))
+
+    def show_elements(self, elements, final=True, motion=None):
+        frame_size = (self.current_frame.width(), self.current_frame.height())
+        labels, weights = self.label_elements(elements, frame_size, final, motion)
+        if final:
+            self.expected_elements = len(elements)
+            if len(labels):
+                print(f"Labelled {len(labels)} elements, {expected_keystrokes(weights, labels.labels):.2f} keystrokes expected")
+        if self.label_space is not None:
+            # Keep the global prefix even if nothing on this screen matches it
+            labels.set_prefix(self.current_input)
+        elif self.current_input and not labels.set_prefix(self.current_input):
+            labels.reset()
+        self.clickable_elements = elements
+        self.element_labels = labels
+        self.tracked_frame = self.current_frame
+        self.update_overlay_signal.emit()
 
     def extract_elements_from_result(self, result):
-        elements = []
-        for box in result.boxes:
-            dim = (box.xywhn).tolist()[0]
-            orig_width, orig_height = box.orig_shape[1], box.orig_shape[0]
-            width = int(dim[2] * orig_width)
-            height = int(dim[3] * orig_height)
-            x = int(dim[0] * orig_width - width/2)
-            y = int(dim[1] * orig_height - height/2)
-            elements.append(QRect(x, y, width, height))
-        return elements
+        with tracing.span('box_extraction'):
+            return boxes_from_result(result)
 
     def filter_overlapping_elements(self, elements, overlap_threshold=0.2):
-        sorted_elements = sorted(elements, key=lambda e: e.width() * e.height())
-        filtered_elements = []
-        for i, element in enumerate(sorted_elements):
-            if all(not self.is_significant_overlap(element, filtered_elem, overlap_threshold) 
-                   for filtered_elem in filtered_elements):
-                filtered_elements.append(element)
-        return filtered_elements
-
-    def is_significant_overlap(self, elem1, elem2, threshold):
-        intersect = elem1.intersected(elem2)
-        intersect_area = intersect.width() * intersect.height()
-        elem1_area = elem1.width() * elem1.height()
-        elem2_area = elem2.width() * elem2.height()
-
-        # Avoid division by zero by checking if any element has zero area
-        if elem1_area == 0 or elem2_area == 0:
-            return False  # No overlap if one element has zero area
-
-        smaller_elem_area = min(elem1_area, elem2_area)
-        
-        return intersect_area / smaller_elem_area > threshold
+        with tracing.span('overlap_filter', count=len(elements)):
+            return elements[filter_overlapping_boxes(elements, overlap_threshold)]
+
+    def label_elements(self, elements, frame_size, final=True, motion=None):
+        # The tracker gives boxes that were already shown their old label,
+        # only new ones get labels from allocate_labels. Partial results
+        # leave room in the code for the boxes a pass usually still finds,
+        # going by the last final pass, and so do the other screens' boxes
+        # that aren't labelled yet.
+        with tracing.span('label_generation', count=len(elements)):
+            weights = self.click_weights(elements, frame_size)
+            reserve = 0 if final else max(0, self.expected_elements - len(elements))
+            if self.label_space is not None:
+                reserve += self.label_space.elements_to_come(self, len(elements) + reserve)
+            allocate = partial(self.allocate_labels, weights, reserve)
+            labels = self.tracker.update(elements, allocate, final, motion)
+            if labels is None:
+                # The other screens left no room at all
+                labels = self.label_space.relabel(self, elements, weights)
+            return LabelIndex(labels), weights
+
+    def elements_to_come(self, estimate):
+        # Boxes this screen's detection is still expected to label, `estimate`
+        # when no pass has finished here yet
+        if self.settled is not None:
+            return 0
+        return max(0, (self.expected_elements or estimate) - len(self.clickable_elements))
+
+    def shown_weights(self):
+        # click_weights of the boxes on screen
+        if self.tracked_frame is None or not len(self.clickable_elements):
+            return np.zeros(0)
+        return self.click_weights(self.clickable_elements, (self.tracked_frame.width(), self.tracked_frame.height()))
+
+    def show_labels(self, labels):
+        # New labels for the boxes on screen, planned by OverlayManager
+        self.element_labels = LabelIndex(labels)
+        self.element_labels.set_prefix(self.current_input)
+        self.update()
 
+    def click_weights(self, elements, frame_size):
+        # How likely each element is the one to be clicked
+        if self.click_history is None:
+            history = np.zeros(len(elements))
+        else:
+            history = self.click_history.scores(self.click_context(), elements, frame_size)
+        return click_weights(elements, history)
+
+    def allocate_labels(self, weights, reserve, indices, taken):
+        # Shortest labels for the likeliest clicks, in the code space the
+        # labels already shown (on any screen) leave free. `reserve` stand-ins
+        # of average weight keep code space for boxes that aren't found yet.
+        wanted = weights[indices]
+        if reserve:
+            wanted = np.concatenate((wanted, np.full(reserve, weights.mean())))
+        labels = prefix_code(wanted, free_slots(taken, config.LABEL_ALPHABET), config.LABEL_ALPHABET)
+        return labels if labels is None else labels[:len(indices)]
 
     def generate_labels(self, count):
-        labels = []
-        characters = 'abcdefghijklmnopqrstuvwxyz'
-        
-        # Step 1: Reserve the last x letters for single-character labels (default to 12)
-        single_char_limit = min(count, 12)
-        single_char_labels = list(characters[single_char_limit:])
-        labels.extend(single_char_labels)
-        
-        # Step 2: If more labels are needed, generate multi-character labels dynamically
-        remaining_count = count - len(labels)
-        
-        if remaining_count > 0:
-            current_length = 2  # Start with two-character labels
-            
-            while remaining_count > 0:
-                first_characters = characters[:single_char_limit]  # Use reserved first characters
-                # Dynamically generate labels of current length
-                for combo in itertools.product(first_characters, repeat=current_length):
-                    labels.append(''.join(combo))
-                    if len(labels) == count:  # Stop once we reach the desired count
-                        return labels
-                
-                # Increase the length for the next iteration
-                current_length += 1
-                remaining_count = count - len(labels)  # Update the remaining count
-
-        return labels[:count]
+        # Labels for `count` equally likely elements, as short as possible
+        return LabelIndex(prefix_code([1] * count, alphabet=config.LABEL_ALPHABET))
 
 
     def handle_key_press(self, key):
@@ -201,7 +600,7 @@ class OverlayWindow(QMainWindow):
                 self.current_input = self.current_input[:-1]
             elif key == 'esc':
                 self.stop_grid_view()
-            self.update()
+            self.update_grid_input()
         elif self.is_overlay_active:
             if key.isalpha():
                 self.current_input += key.lower()
@@ -211,7 +610,14 @@ class OverlayWindow(QMainWindow):
                 self.update_labels_starting_with(self.current_input)
             elif key == 'esc':
                 self.stop_element_detection()
-        self.update()
+
+    def update_grid_input(self):
+        # In the zoomed view typing only changes the sub-grid labels
+        if self.is_grid_view_active and self.grid_mode == 'zoomed' and self.zoomed_rect:
+            margin = 2 * self.render_cache.font_height
+            self.update(self.zoomed_rect.adjusted(-margin, -margin, margin, margin))
+        else:
+            self.update()
 
     def select_main_cell(self, cell_id):
         print(f"Selecting main cell: {cell_id}")
@@ -222,6 +628,7 @@ class OverlayWindow(QMainWindow):
                 self.selected_cell = (row, col)
                 self.grid_mode = 'zoomed'
                 self.current_input = ''
+                self.render_cache.release_layers()  # the zoomed view paints no layer
                 self.capture_zoomed_cell()
                 print(f"Selected cell: {self.selected_cell}, Switching to zoomed mode")
             else:
@@ -232,17 +639,46 @@ class OverlayWindow(QMainWindow):
 
 
     def capture_zoomed_cell(self):
-        if self.selected_cell and self.full_screenshot:
+        # Grabs only the selected cell, when it's selected, so grid activation
+        # doesn't need a screenshot and the zoom shows what's on screen now
+        if self.selected_cell:
             row, col = self.selected_cell
             cell_width = self.width() / 26
             cell_height = self.height() / 26
-            
+
             x = int(col * cell_width)
             y = int(row * cell_height)
-            
-            self.zoomed_image = self.full_screenshot.copy(x, y, int(cell_width), int(cell_height))
-
+            cell = QRect(x, y, int(cell_width), int(cell_height))
+
+            # The grid is drawn over the cell, clear that part of the overlay
+            # first. sync() only flushes our own X connection, a compositor
+            # may take another frame to show the cleared cell, so the grab
+            # waits for that.
+            self.capturing_region = True
+            self.zoomed_image = None
+            # Known before the grab, so subcell keys typed meanwhile still click
+            self.zoomed_rect = self.zoomed_cell_rect(cell)
+            self.repaint(cell)
+            QApplication.sync()
+            QTimer.singleShot(config.ZOOM_CAPTURE_DELAY, partial(self.grab_zoomed_cell, cell, self.selected_cell))
+
+    def grab_zoomed_cell(self, cell, selected_cell):
+        if not self.capturing_region or self.selected_cell != selected_cell:
+            return  # the grid was closed or another cell selected meanwhile
+        try:
+            self.zoomed_image = grab_region(cell, self.target_screen)
+        finally:
+            self.capturing_region = False
+            self.update()
 
+    def zoomed_cell_rect(self, cell):
+        # Where the zoomed view of `cell` goes: zoom_height_percentage of the
+        # overlay high, centred on the cell as far as the overlay allows
+        zoom_height = self.height() * self.zoom_height_percentage
+        zoom_width = zoom_height * cell.width() / max(cell.height(), 1)
+        x = max(0, min(cell.x() - zoom_width / 2, self.width() - zoom_width))
+        y = max(0, min(cell.y() - zoom_height / 2, self.height() - zoom_height))
+        return QRect(int(x), int(y), int(zoom_width), int(zoom_height))
 
     def select_subcell(self, subcell_id):
         if self.selected_cell and self.grid_mode == 'zoomed' and self.zoomed_rect:
@@ -277,7 +713,7 @@ class OverlayWindow(QMainWindow):
                 screen_y = (main_row * main_cell_height) + (zoomed_y * main_cell_height)
 
                 # Perform the click
-                self.mouse.position = (int(screen_x), int(screen_y))
+                self.mouse.position = self.global_mouse_position(screen_x, screen_y)
                 self.mouse.click(Button.left)
                 print(f"Clicked at {screen_x}, {screen_y}")
                 
@@ -288,23 +724,21 @@ class OverlayWindow(QMainWindow):
                 self.current_input = ''
                 self.zoomed_image = None
                 self.zoomed_rect = None
+                self.capturing_region = False  # a grab still waiting is dropped
         self.update()
 
 
-    def capture_full_screenshot(self):
-        screen = QApplication.primaryScreen()
-        self.full_screenshot = screen.grabWindow(0)
-
     def toggle_grid_view(self):
-        if not self.is_grid_view_active:
-            self.capture_full_screenshot()
-        
         self.is_grid_view_active = not self.is_grid_view_active
         self.is_overlay_active = False
         self.grid_mode = 'main'
         self.current_input = ''
         self.selected_cell = None
+        self.zoomed_image = None
+        self.zoomed_rect = None
+        self.capturing_region = False
         print(f"Grid view {'activated' if self.is_grid_view_active else 'deactivated'}")
+        self.render_cache.release_layers()
         self.update()
 
     def stop_grid_view(self):
@@ -312,45 +746,89 @@ class OverlayWindow(QMainWindow):
         self.is_grid_view_active = False
         self.grid_mode = 'main'
         self.selected_cell = None
+        self.zoomed_image = None
+        self.zoomed_rect = None
+        self.capturing_region = False
         self.current_input = ''
+        self.render_cache.release_layers()
         self.update()
 
     def update_labels_starting_with(self, input_string):
-        matching_labels = [label for label in self.element_labels if label.lower().startswith(input_string.lower())]
-        
-        if not matching_labels:
-            # If no matches, keep all labels visible
-            self.current_input = ''
+        if self.label_space is not None:
+            self.label_space.update_prefix(input_string.lower())
             return
 
-        # Update visible labels for matches
-        for i, label in enumerate(self.element_labels):
-            if label.lower().startswith(input_string.lower()):
-                self.element_labels[i] = label
-            else:
-                self.element_labels[i] = ''  # Hide non-matching labels
+        if not self.apply_label_prefix(input_string.lower()):
+            # If no matches, keep all labels visible
+            self.apply_label_prefix('')
+            return
 
         # If there's only one match and it's exactly the input, trigger the click
-        if len(matching_labels) == 1 and matching_labels[0].lower() == input_string.lower():
-            index = self.element_labels.index(matching_labels[0])
+        index = self.element_labels.unique_match()
+        if index is not None:
             self.click_element(index)
             self.current_input = ''  # Reset input after clicking
 
-        self.update()
+    def apply_label_prefix(self, prefix):
+        # Narrows (or widens) the visible hints to `prefix`, False when none match
+        previous_matches = self.element_labels.matches()
+        matched = self.element_labels.set_prefix(prefix)
+        self.current_input = prefix
+
+        # Prefixes are nested, so the larger match set covers every hint
+        # that was hidden, revealed or re-highlighted
+        matches = self.element_labels.matches()
+        self.update_hints(previous_matches if len(previous_matches) > len(matches) else matches)
+        return matched
+
+    def element_rect(self, index):
+        # Boxes are in captured frame pixels, the overlay paints in device independent ones
+        return box_to_qrect(self.clickable_elements[index], 1 / self.target_screen.devicePixelRatio())
+
+    def hint_rect(self, index):
+        element = self.element_rect(index)
+        badge_width, badge_height = self.render_cache.badge_size(self.element_labels[index])
+        badge = QRect(element.left(), element.top(), badge_width, badge_height)
+        return element.united(badge).adjusted(-1, -1, 1, 1)
+
+    def update_hints(self, indices, max_rects=512):
+        if not indices:
+            return
+        if len(indices) > max_rects:
+            # That many hints cover most of the screen anyway, and a huge
+            # region costs more to build than it saves
+            self.update()
+            return
+        # Hint rects overlap, so they can't go into QRegion.setRects(), which
+        # wants banded, disjoint rects. Qt unites the queued rects itself.
+        for index in indices:
+            self.update(self.hint_rect(index))
 
     def scroll_up(self):
         self.mouse.scroll(0, 2)
+        self.on_scroll()
 
     def scroll_down(self):
         self.mouse.scroll(0, -2)
+        self.on_scroll()
 
     def click_element(self, index):
         if 0 <= index < len(self.clickable_elements):
-            element = self.clickable_elements[index]
-            center = element.center()
-            self.mouse.position = (center.x(), center.y())
-            self.mouse.click(Button.left)
-            print(f"Clicked element at {center.x()}, {center.y()}")
+            if self.click_history is not None:
+                self.click_history.record(self.click_context(), self.clickable_elements[index],
+                                          (self.current_frame.width(), self.current_frame.height()),
+                                          len(self.element_labels[index]))
+                print(f"Clicked with {len(self.element_labels[index])} keystrokes, "
+                      f"{self.click_history.average_keystrokes():.2f} on average over {self.click_history.clicks} clicks")
+            x, y = box_center(self.clickable_elements[index])
+            ratio = self.target_screen.devicePixelRatio()
+            x, y = self.global_mouse_position(x / ratio, y / ratio)
+            with tracing.span('click'):
+                self.mouse.position = (x, y)
+                self.mouse.click(Button.left)
+            # End to end: from the activation hotkey to the click being sent
+            tracing.record_since('hotkey_to_click', 'activation')
+            print(f"Clicked element at {x}, {y}")
             
             # Reset the overlay after clicking
             self.stop_element_detection()
@@ -358,13 +836,24 @@ class OverlayWindow(QMainWindow):
             print(f"Invalid index: {index}")
 
     def paintEvent(self, event):
+        with tracing.span('paint_' + self.paint_mode()):
+            self.paint_overlay(event)
+
+    def paint_mode(self):
+        if self.is_grid_view_active:
+            return 'grid_' + self.grid_mode
+        return 'hints' if self.is_overlay_active else 'idle'
+
+    def paint_overlay(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.fillRect(self.rect(), Qt.transparent)
 
-        if not self.is_overlay_active and not self.is_grid_view_active:
+        if self.capturing_region or (not self.is_overlay_active and not self.is_grid_view_active):
             return
 
+        self.render_cache.set_device_pixel_ratio(self.devicePixelRatioF())
+
         self.draw_overlay_border(painter)
         
         if self.is_overlay_active:
@@ -377,31 +866,14 @@ class OverlayWindow(QMainWindow):
                 self.draw_zoomed_cell(painter)
 
     def draw_zoomed_cell(self, painter):
-        if not self.zoomed_image or not self.selected_cell:
+        if not self.zoomed_image or self.zoomed_image.image.isNull() or not self.selected_cell or not self.zoomed_rect:
             return
 
-        original_aspect_ratio = self.zoomed_image.width() / self.zoomed_image.height()
-        zoom_height = self.height() * self.zoom_height_percentage
-        zoom_width = zoom_height * original_aspect_ratio
-
-        # Calculate the position of the selected cell
-        cell_width = self.width() / 26
-        cell_height = self.height() / 26
-        selected_x = self.selected_cell[1] * cell_width
-        selected_y = self.selected_cell[0] * cell_height
-
-        # Calculate the position for the zoomed image
-        x = max(0, min(selected_x - zoom_width / 2, self.width() - zoom_width))
-        y = max(0, min(selected_y - zoom_height / 2, self.height() - zoom_height))
-
-        self.zoomed_rect = QRect(int(x), int(y), int(zoom_width), int(zoom_height))
-
         painter.fillRect(self.rect(), QColor(0, 0, 0, 128))
-        painter.drawPixmap(self.zoomed_rect, self.zoomed_image)
+        painter.drawImage(self.zoomed_rect, self.zoomed_image.image)
 
-        pen = QPen(QColor(0, 255, 255))
-        pen.setWidth(2)
-        painter.setPen(pen)
+        painter.setPen(self.render_cache.border_pen)
+        painter.setBrush(Qt.NoBrush)
         painter.drawRect(self.zoomed_rect)
 
         self.draw_zoomed_grid(painter)
@@ -415,9 +887,7 @@ class OverlayWindow(QMainWindow):
         cell_width = self.zoomed_rect.width() / self.subgrid_divisions
         cell_height = self.zoomed_rect.height() / self.subgrid_divisions
 
-        pen = QPen(QColor(0, 255, 255))
-        pen.setWidth(1)
-        painter.setPen(pen)
+        painter.setPen(self.render_cache.cell_pen)
 
         for i in range(1, self.subgrid_divisions):
             x = self.zoomed_rect.left() + i * cell_width
@@ -426,16 +896,13 @@ class OverlayWindow(QMainWindow):
             y = self.zoomed_rect.top() + i * cell_height
             painter.drawLine(self.zoomed_rect.left(), int(y), self.zoomed_rect.right(), int(y))
 
+        painter.setBrush(self.render_cache.cell_brush)
         for i in range(self.subgrid_divisions):
             for j in range(self.subgrid_divisions):
                 x = self.zoomed_rect.left() + j * cell_width
                 y = self.zoomed_rect.top() + i * cell_height
-                
-                cyan = QColor(0, 255, 255)
-                painter.setPen(QPen(cyan))
-                cyan.setAlpha(20)
-                painter.setBrush(QBrush(cyan))
-                
+
+                painter.setPen(self.render_cache.cell_pen)
                 painter.drawRect(QRect(int(x), int(y), int(cell_width), int(cell_height)))
 
                 cell_index = i * self.subgrid_divisions + j
@@ -450,28 +917,39 @@ class OverlayWindow(QMainWindow):
                     self.draw_element_label(painter, QPoint(int(x), int(y)), label)
 
     def draw_main_grid(self, painter):
-        pen = QPen(QColor(0, 255, 255))
-        pen.setWidth(2)
-        painter.setPen(pen)
+        if not self.current_input:
+            painter.drawPixmap(0, 0, self.render_cache.layer('grid', self.size(), self.paint_grid_layer))
+            return
 
+        # Only the row picked by the first letter stays labelled
+        painter.drawPixmap(0, 0, self.render_cache.layer('grid_cells', self.size(), self.paint_grid_cells))
         cell_width = self.width() / 26
         cell_height = self.height() / 26
+        row = ord(self.current_input[0]) - ord('a')
+        for i in range(26):
+            label = f"{self.current_input[0]}{chr(97 + i)}"
+            if label.startswith(self.current_input):
+                self.draw_element_label(painter, QPoint(int(i * cell_width), int(row * cell_height)), label)
 
+    def paint_grid_cells(self, painter, with_labels=False):
+        cell_width = self.width() / 26
+        cell_height = self.height() / 26
+
+        painter.setBrush(self.render_cache.cell_brush)
         for i in range(26):
             for j in range(26):
                 x = i * cell_width
                 y = j * cell_height
-                
-                cyan = QColor(0, 255, 255)
-                painter.setPen(QPen(cyan))
-                cyan.setAlpha(20)
-                painter.setBrush(QBrush(cyan))
-                
+
+                painter.setPen(self.render_cache.cell_pen)
                 painter.drawRect(QRect(int(x), int(y), int(cell_width), int(cell_height)))
 
-                label = f"{chr(97 + j)}{chr(97 + i)}"
-                if not self.current_input or label.startswith(self.current_input):
-                    self.draw_element_label(painter, QPoint(int(x), int(y)), label)
+                if with_labels:
+                    label = f"{chr(97 + j)}{chr(97 + i)}"
+                    painter.drawPixmap(int(x), int(y), self.render_cache.badge(label))
+
+    def paint_grid_layer(self, painter):
+        self.paint_grid_cells(painter, with_labels=True)
 
     def draw_sub_grid(self, painter):
         if not self.selected_cell:
@@ -516,57 +994,37 @@ class OverlayWindow(QMainWindow):
                                  Qt.AlignCenter, label)
 
     def draw_overlay_border(self, painter):
-        pen = QPen(QColor(0, 255, 255))
-        pen.setWidth(2)
-        painter.setPen(pen)
+        painter.setPen(self.render_cache.border_pen)
+        painter.setBrush(Qt.NoBrush)
         painter.drawRect(self.rect().adjusted(2, 2, -2, -2))
 
 
     def draw_clickable_elements(self, painter):
-        for element, label in zip(self.clickable_elements, self.element_labels):
-            if label:  # Only draw elements with non-empty labels
-                self.draw_element_label(painter, element.topLeft(), label)
-
-                cyan = QColor(0, 255, 255)
-                painter.setPen(QPen(cyan))
-                cyan.setAlpha(20)
-                painter.setBrush(QBrush(cyan))
-
+        if not self.current_input:
+            painter.drawPixmap(0, 0, self.render_cache.layer(
+                'elements', self.size(), self.paint_element_layer, token=self.element_labels))
+            return
+        self.paint_elements(painter, self.element_labels.matches())
+
+    def paint_element_layer(self, painter):
+        self.paint_elements(painter, self.element_labels.matches(), matched=0)
+
+    def paint_elements(self, painter, indices, matched=None):
+        if matched is None:
+            matched = len(self.current_input)
+        painter.setPen(self.render_cache.cell_pen)
+        painter.setBrush(self.render_cache.cell_brush)
+        for index in indices:
+            label = self.element_labels[index]
+            if label:
+                element = self.element_rect(index)
+                painter.drawPixmap(element.topLeft(), self.render_cache.badge(label, matched))
                 painter.drawRect(element)
 
     def draw_element_label(self, painter, position, label):
         if not label:
             return
-
-        x, y = position.x(), position.y()
-        painter.setFont(self.label_font)
-        metrics = QFontMetrics(self.label_font)
-
-        text_width = metrics.width(label)
-        font_height = metrics.height()
-
-        padding_x = int(font_height * 0.1)
-        padding_y = int(font_height * 0.1)
-
-        rect_width = text_width + 2 * padding_x
-        rect_height = font_height + 2 * padding_y
-
-        # Draw background rectangle
-        painter.fillRect(x, y, rect_width, rect_height, QColor(0, 255, 255))
-
-        # Draw text
-        painter.setPen(QColor(0, 0, 0))  # Black text color
-        text_x = x + padding_x
-        text_y = y + rect_height - padding_y - metrics.descent()
-        painter.drawText(text_x, text_y, label)
-
-        # Highlight matched part of the label
-        if self.current_input:
-            matched_text = label[:len(self.current_input)]
-            matched_width = metrics.width(matched_text)
-            painter.fillRect(x, y, matched_width + 2 * padding_x, rect_height, QColor(0, 255, 0, 128))  # Semi-transparent green
-            painter.setPen(QColor(0, 0, 0))  # Black text color
-            painter.drawText(text_x, text_y, matched_text)
+        painter.drawPixmap(position, self.render_cache.badge(label, len(self.current_input)))
 
 
     def draw_settings_info(self, painter):
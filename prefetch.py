@@ -0,0 +1,43 @@
+from collections import deque
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def on_battery_power():
+    if psutil is None:
+        return False
+    try:
+        battery = psutil.sensors_battery()
+    except (AttributeError, NotImplementedError):
+        return False
+    return battery is not None and not battery.power_plugged
+
+
+class PrefetchPolicy:
+    # Decides whether a speculative detection may run: never on battery
+    # (unless allowed), and never when prefetches already used more than
+    # `cpu_budget` of the last `window` seconds
+
+    def __init__(self, cpu_budget=0.25, window=60.0, allow_on_battery=False):
+        self.cpu_budget = cpu_budget
+        self.window = window
+        self.allow_on_battery = allow_on_battery
+        self.runs = deque()  # (finished_at, duration)
+
+    def record(self, duration):
+        self.runs.append((time.monotonic(), duration))
+
+    def spent(self):
+        cutoff = time.monotonic() - self.window
+        while self.runs and self.runs[0][0] < cutoff:
+            self.runs.popleft()
+        return sum(duration for _, duration in self.runs)
+
+    def allows(self):
+        if not self.allow_on_battery and on_battery_power():
+            return False
+        return self.spent() < self.cpu_budget * self.window
@@ -0,0 +1,139 @@
+import numpy as np
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+import config
+
+# 32-bit formats whose bytes are laid out as B, G, R, A on little-endian machines
+BGRX_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied)
+
+
+class CapturedFrame:
+    def __init__(self, image):
+        if image.format() not in BGRX_FORMATS:
+            image = image.convertToFormat(QImage.Format_RGB32)
+        # The pixel array is a view into this image, so the image has to outlive it
+        self.image = image
+        self.pixels = qimage_to_array(image)
+
+    def width(self):
+        return self.image.width()
+
+    def height(self):
+        return self.image.height()
+
+    def save(self, path):
+        self.image.save(path, 'png')
+
+
+def qimage_to_array(image):
+    # HxWx3 BGR view sharing the QImage buffer (the layout the YOLO model expects),
+    # no pixel data is copied here
+    if image.isNull():
+        return np.zeros((0, 0, 3), dtype=np.uint8)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    buffer = np.frombuffer(ptr, dtype=np.uint8)
+    buffer = buffer.reshape(image.height(), image.bytesPerLine() // 4, 4)
+    return buffer[:, :image.width(), :3]
+
+
+class QtCapture:
+    # QScreen.grabWindow(), works on every platform Qt does
+    name = 'qt'
+
+    def grab(self, screen, rect=None):
+        if rect is None:
+            return CapturedFrame(screen.grabWindow(0).toImage())
+        return CapturedFrame(screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height()).toImage())
+
+    def close(self):
+        pass
+
+
+class XShmCapture:
+    # X11 MIT-SHM, see x11_capture. Rects are in Qt's logical coordinates,
+    # the root window in device pixels. Qt keeps a screen's origin in device
+    # pixels already, only its size is scaled.
+    name = 'xshm'
+
+    def __init__(self):
+        from x11_capture import XShmCapture as Grabber
+        self.grabber = Grabber()
+
+    def grab(self, screen, rect=None):
+        ratio = screen.devicePixelRatio()
+        geometry = screen.geometry()
+        if rect is None:
+            rect = QRect(0, 0, geometry.width(), geometry.height())
+        root_width, root_height = self.grabber.root_size
+        x = max(0, geometry.x() + round(rect.x() * ratio))
+        y = max(0, geometry.y() + round(rect.y() * ratio))
+        width = min(round(rect.width() * ratio), root_width - x)
+        height = min(round(rect.height() * ratio), root_height - y)
+        if width <= 0 or height <= 0:
+            return CapturedFrame(QImage())
+        return CapturedFrame(self.grabber.grab(x, y, width, height))
+
+    def close(self):
+        self.grabber.close()
+
+
+CAPTURE_BACKENDS = {
+    QtCapture.name: QtCapture,
+    XShmCapture.name: XShmCapture,
+}
+
+
+def load_capture_backend(name):
+    # 'auto' takes MIT-SHM on X11 and Qt everywhere else. Falls back to Qt
+    # when the requested backend can't start.
+    if name != 'auto' and name not in CAPTURE_BACKENDS:
+        print(f"Unknown capture backend '{name}', using {QtCapture.name}")
+        name = QtCapture.name
+    if name == 'auto':
+        name = XShmCapture.name if QApplication.platformName() == 'xcb' else QtCapture.name
+    if name != QtCapture.name:
+        try:
+            return CAPTURE_BACKENDS[name]()
+        except (OSError, ImportError) as e:
+            print(f"Could not use the {name} capture backend ({e}), falling back to {QtCapture.name}")
+    return QtCapture()
+
+
+backend = None
+
+
+def capture_backend():
+    global backend
+    if backend is None:
+        backend = load_capture_backend(config.CAPTURE_BACKEND)
+    return backend
+
+
+def close_capture_backend():
+    global backend
+    if backend is not None:
+        backend.close()
+        backend = None
+
+
+def grab(screen, rect):
+    if screen is None:
+        screen = QApplication.primaryScreen()
+    try:
+        return capture_backend().grab(screen, rect)
+    except OSError as e:
+        print(f"Capture with {capture_backend().name} failed ({e}), using {QtCapture.name}")
+        return QtCapture().grab(screen, rect)
+
+
+def grab_screen(screen=None):
+    return grab(screen, None)
+
+
+def grab_region(rect, screen=None):
+    # Only `rect` (in the screen's logical coordinates) is read back, at the
+    # screen's native resolution
+    return grab(screen, rect)
@@ -0,0 +1,118 @@
+import numpy as np
+
+ROW_WEIGHTS = np.random.default_rng(0).integers(1, 2 ** 63, size=8192, dtype=np.uint64) | np.uint64(1)
+
+
+def row_hashes(pixels, strips=8, step=4):
+    # One 64 bit hash per row for each of `strips` vertical strips, from every
+    # `step`th column. Returns the hashes (rows, strips) and the strip bounds.
+    height, width = pixels.shape[:2]
+    bounds = np.linspace(0, width, strips + 1).astype(np.int64)
+    hashes = np.empty((height, strips), dtype=np.uint64)
+    for i, (x0, x1) in enumerate(zip(bounds[:-1], bounds[1:])):
+        strip = pixels[:, x0:x1:step].reshape(height, -1).astype(np.uint64)
+        hashes[:, i] = strip @ ROW_WEIGHTS[:strip.shape[1]]
+    return hashes, bounds
+
+
+def match_rows(previous, current):
+    # Rows of `current` whose hash occurs exactly once in `previous`, and the
+    # offset to that row. Blank and repeated rows can't tell a scroll apart.
+    values, first, counts = np.unique(previous, return_index=True, return_counts=True)
+    unique = counts == 1
+    values, first = values[unique], first[unique]
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    position = np.minimum(np.searchsorted(values, current), len(values) - 1)
+    found = values[position] == current
+    rows = np.nonzero(found)[0]
+    return rows, first[position[found]] - rows
+
+
+class ScrollEstimate:
+    def __init__(self, offset, left, top, right, bottom):
+        # Content moved up by `offset` pixels (negative: down) inside the
+        # scrolled area left, top, right, bottom (exclusive ends)
+        self.offset = offset
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def exposed_rows(self):
+        # Rows of the new frame showing content the previous frame didn't have
+        if self.offset > 0:
+            return max(self.top, self.bottom - self.offset), self.bottom
+        return self.top, min(self.bottom, self.top - self.offset)
+
+    def exposed_fraction(self, width, height):
+        top, bottom = self.exposed_rows()
+        return (bottom - top) * (self.right - self.left) / (width * height)
+
+    def band(self, margin=48):
+        # Region to run the model on: the exposed rows plus a margin of known
+        # content, so boxes cut by the edge of the exposed rows are found whole
+        top, bottom = self.exposed_rows()
+        return self.left, max(self.top, top - margin), self.right, min(self.bottom, bottom + margin)
+
+    def inside(self, boxes):
+        center_x = boxes[:, 0] + boxes[:, 2] // 2
+        center_y = boxes[:, 1] + boxes[:, 3] // 2
+        return ((center_x >= self.left) & (center_x < self.right)
+                & (center_y >= self.top) & (center_y < self.bottom))
+
+    def shift_boxes(self, boxes):
+        # Boxes of the previous frame moved along with the content. Boxes that
+        # end up (partly) in the exposed rows or out of view are dropped, the
+        # model looks at those rows again anyway.
+        moving = self.inside(boxes)
+        shifted = boxes.copy()
+        shifted[moving, 1] -= self.offset
+        top, bottom = self.exposed_rows()
+        visible_top, visible_bottom = (self.top, top) if self.offset > 0 else (bottom, self.bottom)
+        visible = (shifted[:, 1] >= visible_top) & (shifted[:, 1] + shifted[:, 3] <= visible_bottom)
+        return shifted[~moving | visible]
+
+    def reaches_exposed(self, boxes):
+        top, bottom = self.exposed_rows()
+        return (boxes[:, 1] < bottom) & (boxes[:, 1] + boxes[:, 3] > top)
+
+
+def estimate_scroll(previous, current, strips=8, min_rows=24):
+    # Vertical scroll between two frames of the same size, by matching rows:
+    # every distinctive row of `current` found in `previous` votes for an
+    # offset. Strips (column ranges) where a nonzero offset wins form the
+    # scrolled area, so a scrolled pane next to a static sidebar works too.
+    # Returns a ScrollEstimate, or None when nothing scrolled.
+    if previous.shape != current.shape:
+        return None
+    previous_hashes, bounds = row_hashes(previous, strips)
+    current_hashes, _ = row_hashes(current, strips)
+
+    matches = [match_rows(previous_hashes[:, i], current_hashes[:, i]) for i in range(strips)]
+    moved = np.concatenate([offsets[offsets != 0] for _, offsets in matches])
+    if len(moved) < min_rows:
+        return None
+    values, counts = np.unique(moved, return_counts=True)
+    offset = int(values[counts.argmax()])
+    if counts.max() < min_rows:
+        return None
+
+    scrolled = []
+    matched_rows = []
+    for i, (rows, offsets) in enumerate(matches):
+        with_offset = offsets == offset
+        if with_offset.sum() >= max(4, (offsets == 0).sum()):
+            scrolled.append(i)
+            matched_rows.append(rows[with_offset])
+    if not scrolled:
+        return None
+
+    height = current.shape[0]
+    rows = np.concatenate(matched_rows)
+    # Matched rows are the part of the scrolled area that was already on screen
+    if offset > 0:
+        top, bottom = int(rows.min()), min(height, int(rows.max()) + 1 + offset)
+    else:
+        top, bottom = max(0, int(rows.min()) + offset), int(rows.max()) + 1
+    return ScrollEstimate(offset, int(bounds[min(scrolled)]), top, int(bounds[max(scrolled) + 1]), bottom)
@@ -0,0 +1,141 @@
+import zlib
+
+import numpy as np
+
+
+def tile_checksums(pixels, tile_size):
+    # CRC-32 of every tile_size x tile_size tile, the partial ones at the
+    # right and bottom edges included. Exact: any changed pixel, however
+    # small the change, changes its tile's checksum.
+    height, width = pixels.shape[:2]
+    rows = -(-height // tile_size)
+    columns = -(-width // tile_size)
+    checksums = np.empty((rows, columns), dtype=np.int64)
+    for row in range(rows):
+        band = pixels[row * tile_size:(row + 1) * tile_size]
+        for column in range(columns):
+            checksums[row, column] = zlib.crc32(np.ascontiguousarray(band[:, column * tile_size:(column + 1) * tile_size]))
+    return checksums
+
+
+def mask_integral(mask):
+    integral = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    integral[1:, 1:] = mask.astype(np.int32).cumsum(axis=0).cumsum(axis=1)
+    return integral
+
+
+def boxes_touching_mask(boxes, mask, cell_size):
+    # True for every box that covers at least one set cell of `mask`
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=bool)
+    rows, columns = mask.shape
+    left = np.clip(boxes[:, 0] // cell_size, 0, columns)
+    top = np.clip(boxes[:, 1] // cell_size, 0, rows)
+    right = np.clip((boxes[:, 0] + np.maximum(boxes[:, 2], 1) - 1) // cell_size + 1, 0, columns)
+    bottom = np.clip((boxes[:, 1] + np.maximum(boxes[:, 3], 1) - 1) // cell_size + 1, 0, rows)
+    integral = mask_integral(mask)
+    covered = integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left]
+    return covered > 0
+
+
+def connected_regions(mask):
+    # Bounding boxes (row0, column0, row1, column1), exclusive ends, of the
+    # 8-connected groups of set cells
+    seen = np.zeros_like(mask, dtype=bool)
+    regions = []
+    rows, columns = mask.shape
+    for row, column in zip(*np.nonzero(mask)):
+        if seen[row, column]:
+            continue
+        seen[row, column] = True
+        stack = [(row, column)]
+        top, left, bottom, right = row, column, row, column
+        while stack:
+            r, c = stack.pop()
+            top, left, bottom, right = min(top, r), min(left, c), max(bottom, r), max(right, c)
+            for nr in range(max(r - 1, 0), min(r + 2, rows)):
+                for nc in range(max(c - 1, 0), min(c + 2, columns)):
+                    if mask[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        regions.append((top, left, bottom + 1, right + 1))
+    return regions
+
+
+def merge_rects(rects):
+    # Union overlapping (x0, y0, x1, y1) rectangles until none overlap
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+class DetectionPlan:
+    def __init__(self, checksums, dirty_tiles=None, regions=None):
+        self.checksums = checksums
+        self.dirty_tiles = dirty_tiles
+        # (x0, y0, x1, y1) pixel regions to run the model on, None for the whole frame
+        self.regions = regions
+
+    @property
+    def full(self):
+        return self.regions is None
+
+
+class TileChangeTracker:
+    # Remembers the tile checksums and raw detections of the last frame, so
+    # the next detection only has to look at the tiles that changed since
+
+    def __init__(self, tile_size=256, margin=48, max_dirty_fraction=0.5):
+        self.tile_size = tile_size
+        self.margin = margin
+        self.max_dirty_fraction = max_dirty_fraction
+        self.previous_checksums = None
+        self.previous_boxes = None
+
+    def plan(self, pixels):
+        checksums = tile_checksums(pixels, self.tile_size)
+        if self.previous_checksums is None or self.previous_checksums.shape != checksums.shape:
+            return DetectionPlan(checksums)
+
+        dirty_tiles = checksums != self.previous_checksums
+        if dirty_tiles.mean() > self.max_dirty_fraction:
+            return DetectionPlan(checksums)
+
+        height, width = pixels.shape[:2]
+        regions = []
+        for top, left, bottom, right in connected_regions(dirty_tiles):
+            regions.append((max(int(left) * self.tile_size - self.margin, 0),
+                            max(int(top) * self.tile_size - self.margin, 0),
+                            min(int(right) * self.tile_size + self.margin, width),
+                            min(int(bottom) * self.tile_size + self.margin, height)))
+        return DetectionPlan(checksums, dirty_tiles, merge_rects(regions))
+
+    # Boxes from clean tiles survive; boxes found in the re-detected regions
+    # only count where they reach into a changed tile, the rest of each
+    # region is margin already covered by the surviving boxes
+
+    def clean_boxes(self, plan):
+        return self.previous_boxes[~boxes_touching_mask(self.previous_boxes, plan.dirty_tiles, self.tile_size)]
+
+    def dirty_boxes(self, plan, boxes):
+        return boxes[boxes_touching_mask(boxes, plan.dirty_tiles, self.tile_size)]
+
+    def remember(self, plan, boxes):
+        self.previous_checksums = plan.checksums
+        self.previous_boxes = boxes
+
+    def remember_frame(self, pixels, boxes):
+        # For boxes found some other way than through plan()
+        self.remember(DetectionPlan(tile_checksums(pixels, self.tile_size)), boxes)
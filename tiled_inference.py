@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+from box_utils import deduplicate_boxes
+
+
+def tile_origins(length, tile_size, overlap):
+    # Evenly spread tile starts covering [0, length) with at least `overlap` pixels shared
+    if length <= tile_size:
+        return [0]
+    count = math.ceil((length - tile_size) / (tile_size - overlap)) + 1
+    return [round(i * (length - tile_size) / (count - 1)) for i in range(count)]
+
+
+def drop_cut_boxes(boxes, tile, width, height, margin=2):
+    # Drop boxes (in tile coordinates) touching a tile edge that is not also
+    # an edge of the width x height frame
+    x, y, w, h = tile
+    cut = np.zeros(len(boxes), dtype=bool)
+    if x > 0:
+        cut |= boxes[:, 0] <= margin
+    if y > 0:
+        cut |= boxes[:, 1] <= margin
+    if x + w < width:
+        cut |= boxes[:, 0] + boxes[:, 2] >= w - margin
+    if y + h < height:
+        cut |= boxes[:, 1] + boxes[:, 3] >= h - margin
+    return boxes[~cut]
+
+
+def focus_region(point, size, width, height):
+    # size x size tile (clipped to the frame) centred on point as far as the frame allows
+    tile_width, tile_height = min(size, width), min(size, height)
+    x = min(max(int(point[0]) - tile_width // 2, 0), width - tile_width)
+    y = min(max(int(point[1]) - tile_height // 2, 0), height - tile_height)
+    return x, y, tile_width, tile_height
+
+
+class TiledBackend:
+    # Wraps a backend so large frames are cut into overlapping model-sized
+    # tiles that are inferred as one batch, next to a downscaled pass over the
+    # whole frame for elements bigger than a tile. Boxes cut by an inner tile
+    # edge are dropped (a neighbouring tile or the whole-frame pass sees them
+    # in full) and duplicates from overlapping tiles are suppressed.
+
+    def __init__(self, backend, tile_size=640, overlap=0.25, batch_size=16, edge_margin=2, duplicate_iou=0.6):
+        self.backend = backend
+        self.name = f"{backend.name} (tiled)"
+        self.tile_size = tile_size
+        self.overlap = int(tile_size * overlap)
+        self.batch_size = batch_size
+        self.edge_margin = edge_margin
+        self.duplicate_iou = duplicate_iou
+
+    def tiles(self, width, height):
+        tile_width = min(self.tile_size, width)
+        tile_height = min(self.tile_size, height)
+        return [(x, y, tile_width, tile_height)
+                for y in tile_origins(height, self.tile_size, self.overlap)
+                for x in tile_origins(width, self.tile_size, self.overlap)]
+
+    def detect(self, pixels):
+        height, width = pixels.shape[:2]
+        if width <= self.tile_size * 1.5 and height <= self.tile_size * 1.5:
+            return self.backend.detect(pixels)
+
+        tiles = self.tiles(width, height)
+        frames = [pixels] + [pixels[y:y + h, x:x + w] for x, y, w, h in tiles]
+        results = []
+        for start in range(0, len(frames), self.batch_size):
+            results.extend(self.backend.detect_batch(frames[start:start + self.batch_size]))
+
+        found = [results[0]]
+        for tile, boxes in zip(tiles, results[1:]):
+            found.append(drop_cut_boxes(boxes, tile, width, height, self.edge_margin) + (tile[0], tile[1], 0, 0, 0))
+        boxes = np.concatenate(found)
+        return boxes[deduplicate_boxes(boxes, self.duplicate_iou)]
+
+    def detect_batch(self, frames):
+        return [self.detect(frame) for frame in frames]
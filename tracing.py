@@ -0,0 +1,135 @@
+from collections import deque
+import json
+import os
+import threading
+import time
+
+import config
+
+# Spans cost a single flag check while tracing is off
+enabled = config.TRACE
+events = deque(maxlen=100000)  # (name, start, duration, pid, tid, args)
+durations = {}  # name -> rolling window of recent durations
+marks = {}  # name -> perf_counter() of a point in time other spans can be measured from
+window = 1000
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+class Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **args):
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+def record(name, start, end=None, args=None):
+    # perf_counter() is CLOCK_MONOTONIC on Linux, so spans recorded in the
+    # inference worker line up with the ones recorded here
+    if not enabled:
+        return
+    if end is None:
+        end = time.perf_counter()
+    duration = end - start
+    events.append((name, start, duration, os.getpid(), threading.get_ident(), args or None))
+    durations.setdefault(name, deque(maxlen=window)).append(duration)
+
+
+def mark(name, at=None):
+    if enabled:
+        marks[name] = time.perf_counter() if at is None else at
+
+
+def record_since(name, mark_name):
+    start = marks.get(mark_name)
+    if start is not None:
+        record(name, start)
+
+
+def collect():
+    # Hands over (and forgets) the events recorded so far, for another process to ingest
+    collected = []
+    while events:
+        try:
+            collected.append(events.popleft())
+        except IndexError:
+            break
+    return collected
+
+
+def ingest(collected):
+    for name, start, duration, pid, tid, args in collected:
+        events.append((name, start, duration, pid, tid, args))
+        durations.setdefault(name, deque(maxlen=window)).append(duration)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summary():
+    report = {}
+    for name, values in list(durations.items()):
+        if not values:
+            continue
+        values = list(values)
+        report[name] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p90_ms': percentile(values, 90) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': max(values) * 1000,
+        }
+    return report
+
+
+def format_summary():
+    lines = [f"{'span':<24} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, row in sorted(summary().items()):
+        lines.append(f"{name:<24} {row['count']:>6} {row['p50_ms']:>9.2f} {row['p90_ms']:>9.2f} "
+                     f"{row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def export_chrome_trace(path):
+    # Loadable in chrome://tracing or https://ui.perfetto.dev
+    trace_events = []
+    for name, start, duration, pid, tid, args in list(events):
+        event = {'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': pid, 'tid': tid}
+        if args:
+            event['args'] = args
+        trace_events.append(event)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import json
+import os
+import threading
+
+import numpy as np
+
+from box_utils import with_scores
+
+
+def box_patches(pixels, boxes, samples=4):
+    # samples x samples grey values spread over every box, as a cheap
+    # fingerprint of what the box showed
+    height, width = pixels.shape[:2]
+    fractions = (np.arange(samples) + 0.5) / samples
+    xs = np.clip(boxes[:, 0, None] + (boxes[:, 2, None] * fractions).astype(np.int64), 0, width - 1)
+    ys = np.clip(boxes[:, 1, None] + (boxes[:, 3, None] * fractions).astype(np.int64), 0, height - 1)
+    patches = pixels[ys[:, :, None], xs[:, None, :]].astype(np.uint16).sum(axis=3) // 3
+    return patches.reshape(len(boxes), -1).astype(np.uint8)
+
+
+def window_key(window, screen_origin, frame_size):
+    # Same application, same window geometry, same screen: the boxes are
+    # where they were, as long as the content still matches
+    return '|'.join(str(part) for part in (
+        window.wm_class, window.x, window.y, window.width, window.height, *screen_origin, *frame_size))
+
+
+class WindowMemory:
+    # Detections of the windows seen before, keyed by window_key(). Bounded
+    # by entry count and by total size, least recently used entries go
+    # first, and kept on disk across restarts
+
+    def __init__(self, path=None, max_entries=64, max_bytes=8 << 20, tolerance=12, min_match=0.9):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance  # mean grey level difference a patch may show
+        self.min_match = min_match  # share of boxes that must still match
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (boxes, patches)
+        self.size = 0
+        self.dirty = False  # changed since the last save
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def recall(self, key, pixels):
+        # (boxes, complete): the remembered boxes that still show the same
+        # thing and whether that's all of them, or None when too many of
+        # them changed and the frame needs a real detection
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+        boxes, patches = entry
+        if len(boxes) == 0:
+            return None
+        difference = np.abs(box_patches(pixels, boxes).astype(np.int16) - patches).mean(axis=1)
+        matching = difference <= self.tolerance
+        if matching.mean() < self.min_match:
+            return None
+        return boxes[matching], bool(matching.all())
+
+    def remember(self, key, pixels, boxes):
+        boxes = with_scores(boxes)
+        entry = (boxes, box_patches(pixels, boxes))
+        with self.lock:
+            self.store(key, entry)
+            self.dirty = True
+
+    def store(self, key, entry):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= entry_size(previous)
+        self.entries[key] = entry
+        self.size += entry_size(entry)
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= entry_size(evicted)
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                keys = json.loads(str(data['keys']))
+                for i, key in enumerate(keys):
+                    self.store(key, (with_scores(data[f'boxes_{i}']), data[f'patches_{i}']))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable window memory {self.path}: {e}")
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            entries = list(self.entries.items())
+            self.dirty = False
+        arrays = {'keys': np.array(json.dumps([key for key, _ in entries]))}
+        for i, (_, (boxes, patches)) in enumerate(entries):
+            arrays[f'boxes_{i}'] = boxes.astype(np.int32)
+            arrays[f'patches_{i}'] = patches
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporary, self.path)
+
+
+def entry_size(entry):
+    boxes, patches = entry
+    return boxes.nbytes + patches.nbytes
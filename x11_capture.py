@@ -0,0 +1,163 @@
+import ctypes
+import ctypes.util
+import threading
+
+from PyQt5.QtGui import QImage
+
+from x11_support import c_window, load_x11, open_display
+
+# Screen capture through the MIT-SHM X extension: the X server writes the
+# root window's pixels straight into a shared memory segment, without
+# sending them over the socket the way a plain XGetImage (and Qt's
+# grabWindow) does. The segment is allocated once and reused by every grab.
+
+ZPIXMAP = 2
+ALL_PLANES = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XImage(ctypes.Structure):
+    _fields_ = [
+        ('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int), ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int), ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int), ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong),
+        ('obdata', ctypes.c_void_p), ('functions', ctypes.c_void_p * 6)]
+
+
+class ShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int), ('shmaddr', ctypes.c_void_p),
+                ('read_only', ctypes.c_int)]
+
+
+class XShmCapture:
+    name = 'xshm'
+
+    def __init__(self):
+        x11 = load_x11()
+        xext_path = ctypes.util.find_library('Xext')
+        if not xext_path:
+            raise OSError("No libXext")
+        xext = ctypes.cdll.LoadLibrary(xext_path)
+        libc = ctypes.CDLL(None, use_errno=True)
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+            ctypes.POINTER(ShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(ShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(ShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, c_window, ctypes.POINTER(XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self.x11 = x11
+        self.xext = xext
+        self.libc = libc
+        self.lock = threading.Lock()
+        self.display = open_display()
+        if not xext.XShmQueryExtension(self.display):
+            x11.XCloseDisplay(self.display)
+            raise OSError("The X server has no MIT-SHM extension")
+        screen = x11.XDefaultScreen(self.display)
+        self.root = x11.XDefaultRootWindow(self.display)
+        self.visual = x11.XDefaultVisual(self.display, screen)
+        self.depth = x11.XDefaultDepth(self.display, screen)
+        self.root_size = (x11.XDisplayWidth(self.display, screen), x11.XDisplayHeight(self.display, screen))
+        self.segment = None
+        self.size = 0
+        self.images = {}  # (width, height) -> XImage, all of them on the one segment
+        try:
+            self.allocate(self.root_size[0] * self.root_size[1] * 4)
+            image = self.image(1, 1).contents
+            if image.bits_per_pixel != 32:
+                raise OSError(f"Unsupported {image.bits_per_pixel} bit X visual")
+        except OSError:
+            self.close()
+            raise
+
+    def allocate(self, size):
+        # (Re)creates the shared segment, big enough for `size` bytes of pixels
+        self.release()
+        segment = ShmSegmentInfo()
+        segment.shmid = self.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if segment.shmid < 0:
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        address = self.libc.shmat(segment.shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            self.libc.shmctl(segment.shmid, IPC_RMID, None)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        segment.shmaddr = address
+        segment.read_only = False
+        attached = self.xext.XShmAttach(self.display, ctypes.byref(segment))
+        self.x11.XSync(self.display, False)
+        # Freed by the kernel once both this process and the X server detached
+        self.libc.shmctl(segment.shmid, IPC_RMID, None)
+        if not attached:
+            self.libc.shmdt(address)
+            raise OSError("XShmAttach failed")
+        self.segment = segment
+        self.size = size
+
+    def release(self):
+        for image in self.images.values():
+            # The pixel data is the shared segment, only free the struct
+            image.contents.data = None
+            self.x11.XFree(image)
+        self.images.clear()
+        if self.segment is not None:
+            self.xext.XShmDetach(self.display, ctypes.byref(self.segment))
+            self.x11.XSync(self.display, False)
+            self.libc.shmdt(self.segment.shmaddr)
+            self.segment = None
+            self.size = 0
+
+    def image(self, width, height):
+        image = self.images.get((width, height))
+        if image is None:
+            if width * height * 4 > self.size:
+                self.allocate(width * height * 4)
+            image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, ZPIXMAP,
+                                              self.segment.shmaddr, ctypes.byref(self.segment), width, height)
+            if not image:
+                raise OSError("XShmCreateImage failed")
+            if len(self.images) >= 8:
+                self.release_image(next(iter(self.images)))
+            self.images[(width, height)] = image
+        return image
+
+    def release_image(self, size):
+        image = self.images.pop(size)
+        image.contents.data = None
+        self.x11.XFree(image)
+
+    def grab(self, x, y, width, height):
+        # The root window area as an RGB32 QImage. The segment is overwritten
+        # by the next grab, so the pixels are copied out once
+        with self.lock:
+            image = self.image(width, height)
+            if not self.xext.XShmGetImage(self.display, self.root, image, x, y, ALL_PLANES):
+                raise OSError(f"XShmGetImage failed for {width}x{height}+{x}+{y}")
+            frame = QImage(width, height, QImage.Format_RGB32)
+            stride = image.contents.bytes_per_line
+            if stride == frame.bytesPerLine():
+                ctypes.memmove(int(frame.bits()), self.segment.shmaddr, stride * height)
+            else:
+                for row in range(height):
+                    ctypes.memmove(int(frame.scanLine(row)), self.segment.shmaddr + row * stride, width * 4)
+        return frame
+
+    def close(self):
+        with self.lock:
+            if self.display:
+                self.release()
+                self.x11.XCloseDisplay(self.display)
+                self.display = None
@@ -0,0 +1,64 @@
+import ctypes
+import ctypes.util
+import os
+
+# libX11, loaded once for every module that talks to the X server directly
+# (active_window, x11_capture), with one shared error handler
+
+c_window = ctypes.c_ulong
+c_atom = ctypes.c_ulong
+ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+# The default handler exits the process, e.g. when a window closed between
+# reading its id and its properties. The handler is process-wide, so it's
+# installed once here instead of by each user of libX11.
+error_handler = ERROR_HANDLER(lambda display, event: 0)
+
+x11 = None
+
+
+def load_x11():
+    global x11
+    if x11 is not None:
+        return x11
+    path = ctypes.util.find_library('X11')
+    if not path or not os.environ.get('DISPLAY'):
+        raise OSError("No X11 display")
+    lib = ctypes.cdll.LoadLibrary(path)
+    lib.XOpenDisplay.restype = ctypes.c_void_p
+    lib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    lib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    lib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    lib.XDefaultRootWindow.restype = c_window
+    lib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    lib.XDefaultVisual.restype = ctypes.c_void_p
+    lib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.XFree.argtypes = [ctypes.c_void_p]
+    lib.XInternAtom.restype = c_atom
+    lib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    lib.XGetWindowProperty.argtypes = [
+        ctypes.c_void_p, c_window, c_atom, ctypes.c_long, ctypes.c_long, ctypes.c_int, c_atom,
+        ctypes.POINTER(c_atom), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_ulong),
+        ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p)]
+    lib.XGetGeometry.argtypes = [
+        ctypes.c_void_p, c_window, ctypes.POINTER(c_window), ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint),
+        ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint)]
+    lib.XTranslateCoordinates.argtypes = [
+        ctypes.c_void_p, c_window, c_window, ctypes.c_int, ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(c_window)]
+    lib.XSetErrorHandler.argtypes = [ERROR_HANDLER]
+    lib.XSetErrorHandler(error_handler)
+    x11 = lib
+    return x11
+
+
+def open_display():
+    display = load_x11().XOpenDisplay(None)
+    if not display:
+        raise OSError("Can't open the X11 display")
+    return display